@@ -143,10 +143,10 @@ rm -f function.zip
 
 # Create function zip
 echo "Creating function zip..."
-zip -r function.zip lambda_handler.py service_event_emitter.py > /dev/null
+zip -r function.zip lambda_handler.py service_event_emitter.py s3_streams.py > /dev/null
 
 # TODO: Add any additional files or directories your service needs
-# Example: zip -r function.zip lambda_handler.py service_event_emitter.py my_module/ > /dev/null
+# Example: zip -r function.zip lambda_handler.py service_event_emitter.py s3_streams.py my_module/ > /dev/null
 
 FUNCTION_SIZE=$(du -h function.zip | cut -f1)
 echo "✓ Function packaged: function.zip ($FUNCTION_SIZE)"
@@ -15,10 +15,21 @@ Event format:
   "customer_tier": "standard",
   "stage_config": {
     "custom_param1": "value1",
-    "custom_param2": "value2"
+    "custom_param2": "value2",
+    "next_stages": ["downstream-a-dev", "downstream-b-dev"],  # Optional
+    "dispatch_mode": "async"  # Optional
   }
 }
 
+When stage_config.next_stages (or a single next_stage) lists Lambda function
+names, each one is invoked asynchronously with this stage's output as its input
+once processing succeeds. With dispatch_mode "async" the response also tells the
+caller that the chain continues on its own, so it must not invoke the next stage
+synchronously itself (which would bill every upstream stage for the wait).
+Every target must be listed in DOWNSTREAM_FUNCTIONS. The success event is sent
+before the dispatch; if starting a stage fails, the response stays "success"
+and carries dispatch_error/dispatch_error_type instead.
+
 Response format:
 {
   "status": "success",
@@ -31,27 +42,150 @@ Response format:
 }
 """
 
+import io
 import json
+import logging
+import math
+import operator
 import os
 import time
-import traceback
 from pathlib import Path
-from typing import Any, Dict
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any, BinaryIO, Dict, List, Optional, cast
 
 import boto3
-
-from service_event_emitter import ServiceEventEmitter
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from s3_streams import (
+    MemoryReader,
+    MultipartUploadWriter,
+    PrefetchingReader,
+    download_ranged,
+    download_ranged_to_file,
+)
+from service_event_emitter import (
+    BackgroundEventEmitter,
+    EventEmitter,
+    ServiceEventEmitter,
+    json_dumps,
+)
+
+# Lambda attaches its CloudWatch handler to the root logger. Per-step detail is
+# logged at DEBUG so production (LOG_LEVEL=WARNING or INFO) skips those writes.
+logger = logging.getLogger()
+
+
+def _log_level(name: str) -> int:
+    """Logging level for a LOG_LEVEL value in any case; unknown names give INFO."""
+    level = logging.getLevelName(name.strip().upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+logger.setLevel(_log_level(os.environ.get("LOG_LEVEL", "INFO")))
+
+# Client settings: keep idle connections alive between warm invocations so the
+# next call skips the TLS handshake, and size the pool for parallel transfers
+BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 5},
+    max_pool_connections=32,
+    connect_timeout=3,
+    read_timeout=30,
+)
 
 # Initialize S3 client
-s3_client = boto3.client("s3")
+s3_client = boto3.client("s3", config=BOTO_CONFIG)
+
+# Lambda client for starting downstream stages, created on first use
+_lambda_client: Optional[Any] = None
+
+# Oldest awscrt boto3 accepts for preferred_transfer_client="crt"; with an
+# older one it raises MissingDependencyException instead of falling back
+CRT_MIN_VERSION = (0, 19, 18)
+
+
+def _crt_transfer_supported() -> bool:
+    """Whether boto3 can use the CRT transfer client (awscrt new enough)."""
+    try:
+        import awscrt
+        import awscrt.s3  # noqa: F401
+        from s3transfer.crt import CRTTransferManager  # noqa: F401
+    except ImportError:
+        return False
+    # Parsed the way boto3 does: a version it can't parse counts as too old
+    try:
+        version = tuple(int(part) for part in awscrt.__version__.split("."))
+    except (AttributeError, ValueError):
+        return False
+    return version >= CRT_MIN_VERSION
+
+
+# Use the AWS Common Runtime transfer client when a compatible awscrt is
+# installed (pip install "boto3[crt]"); otherwise the classic transfer manager
+S3_TRANSFER_CLIENT = "crt" if _crt_transfer_supported() else "classic"
+
+# S3 transfer tuning: multipart from 8 MB with parallel parts. Lambdas with at
+# least one full vCPU (>= 1769 MB) can keep more parts in flight.
+# Note: the CRT client sizes parts and concurrency itself and ignores these.
+LAMBDA_MEMORY_MB = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "0"))
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=32 if LAMBDA_MEMORY_MB >= 1769 else 20,
+    use_threads=True,
+    preferred_transfer_client=S3_TRANSFER_CLIENT,
+)
 
 # Lambda tmp directory (hardcoded /tmp is standard for AWS Lambda)
 TMP_DIR = Path("/tmp")  # nosec B108
 
+# Inputs at least this large are fetched with parallel byte-range GETs
+RANGED_DOWNLOAD_THRESHOLD = 16 * 1024 * 1024
+
+# Output size kept in memory before SpooledTemporaryFile rolls over to TMP_DIR
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
 # TODO: Update these constants for your service
 SERVICE_ID = os.environ.get("SERVICE_ID", "your-service-v1")
 SERVICE_VERSION = os.environ.get("SERVICE_VERSION", "1.0.0")
 
+# Fan-outs larger than this are relayed through sqrt(N) intermediate invocations
+FANOUT_DIRECT_LIMIT = 8
+
+# Lambda functions this stage may start (comma-separated, spelled exactly as
+# in next_stages). Next stages and relayed fan-outs naming any other function
+# are rejected, so a caller can't use this function's invoke permission on
+# arbitrary targets.
+DOWNSTREAM_FUNCTIONS = frozenset(
+    name.strip()
+    for name in os.environ.get("DOWNSTREAM_FUNCTIONS", "").split(",")
+    if name.strip()
+)
+
+# Max time the handler waits for queued progress events before returning
+EVENT_FLUSH_TIMEOUT_SECONDS = 0.5
+
+# Max wait once the success/error event is emitted: neither it nor the progress
+# queued before it may be left behind in a container that may never be thawed
+# again, or reach the bus after the state machine sent a held-back one
+TERMINAL_EVENT_FLUSH_TIMEOUT_SECONDS = 10.0
+
+# Required event fields, fetched in one call (raises KeyError for the first missing)
+_REQUIRED_FIELDS = operator.itemgetter(
+    "job_id", "input_bucket", "input_key", "output_bucket"
+)
+
+# Return the success/error event to a Step Functions events:putEvents task
+# instead of sending it from the Lambda (see service_event_emitter.py)
+RETURN_TERMINAL_EVENT = (
+    os.environ.get("RETURN_TERMINAL_EVENT", "false").lower() == "true"
+)
+
+# Overlap download, processing and upload (see s3_streams.py). Only pays off
+# when process_file consumes input and writes output incrementally.
+PIPELINE_TRANSFERS = os.environ.get("PIPELINE_TRANSFERS", "false").lower() == "true"
+
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
@@ -70,7 +204,13 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     try:
         # 1. Validate event format
-        print(f"Received event: {json.dumps(event)}")
+        _log_json("Received event: %s", event)
+
+        if event.get("invocation_type") == "fanout":
+            # Relay hop of a large downstream fan-out (see _fanout_invoke)
+            children = event.get("children", [])
+            _fanout_invoke(children, relay=False)
+            return {"status": "success", "metadata": {"dispatched": len(children)}}
 
         if event.get("invocation_type") != "direct":
             return {
@@ -81,10 +221,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         # 2. Extract required parameters
         try:
-            job_id = event["job_id"]
-            input_bucket = event["input_bucket"]
-            input_key = event["input_key"]
-            output_bucket = event["output_bucket"]
+            job_id, input_bucket, input_key, output_bucket = _REQUIRED_FIELDS(event)
         except KeyError as e:
             return {
                 "status": "error",
@@ -107,71 +244,136 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # TODO: Extract any custom parameters from stage_config
         # custom_param = stage_config.get('custom_param', 'default_value')
 
-        # 4. Initialize progress emitter
-        emitter = ServiceEventEmitter(
-            job_id=job_id, service_id=SERVICE_ID, stage_id=stage_config.get("stage_id")
+        # Downstream stages started on this stage's output (checked up front so
+        # a bad configuration fails before any work is done)
+        next_stages = stage_config.get("next_stages") or []
+        if not isinstance(next_stages, list):
+            # A bare string would otherwise be read one character per stage
+            raise ValueError("stage_config.next_stages must be a list of stages")
+        next_stages = list(next_stages)
+        if stage_config.get("next_stage"):
+            next_stages.append(stage_config["next_stage"])
+        downstream = _next_stage_invocations(next_stages, event, output_key)
+
+        # 4. Initialize progress emitter (events are sent from a background thread)
+        emitter = BackgroundEventEmitter(
+            ServiceEventEmitter(
+                job_id=job_id,
+                service_id=SERVICE_ID,
+                stage_id=stage_config.get("stage_id"),
+                return_terminal_event=RETURN_TERMINAL_EVENT,
+            )
         )
 
         # 5. Emit starting progress
         emitter.emit_progress("Starting processing...")
 
-        print(f"Processing job {job_id}")
-        print(f"Input: s3://{input_bucket}/{input_key}")
-        print(f"Output: s3://{output_bucket}/{output_key}")
-        print(f"Customer tier: {customer_tier}")
+        logger.info(
+            "Processing job %s: s3://%s/%s -> s3://%s/%s (tier: %s)",
+            job_id,
+            input_bucket,
+            input_key,
+            output_bucket,
+            output_key,
+            customer_tier,
+        )
 
-        # 6. Download input file from S3
+        # 6. Open input object (no /tmp round trip). A plain GET serves most
+        # objects; its ContentLength decides whether to switch to ranged GETs,
+        # so small inputs don't pay for a separate HEAD request.
         emitter.emit_progress("Downloading input file from S3...")
 
-        input_filename = Path(input_key).name
-        local_input_path = TMP_DIR / f"input_{job_id}_{input_filename}"
-
-        print(f"Downloading s3://{input_bucket}/{input_key} to {local_input_path}")
-        s3_client.download_file(input_bucket, input_key, str(local_input_path))
-
-        file_size_bytes = local_input_path.stat().st_size
-        print(f"Downloaded {file_size_bytes:,} bytes")
+        input_object = s3_client.get_object(Bucket=input_bucket, Key=input_key)
+        file_size_bytes = input_object["ContentLength"]
+        # Ranged GETs must all read the version this GET found
+        etag = input_object.get("ETag")
+        logger.debug("Input size: %d bytes", file_size_bytes)
+
+        if file_size_bytes > SPOOL_MAX_BYTES and not PIPELINE_TRANSFERS:
+            # Too large for memory: parallel range GETs into a preallocated /tmp file
+            logger.debug("Downloading input in parallel ranges to /tmp")
+            input_object["Body"].close()
+            input_path = str(TMP_DIR / f"{job_id}-input")
+            download_ranged_to_file(
+                s3_client,
+                input_bucket,
+                input_key,
+                file_size_bytes,
+                input_path,
+                etag=etag,
+            )
+            input_stream: BinaryIO = open(input_path, "rb")
+            # Unlinked while open: the space is released when the stream closes
+            os.unlink(input_path)
+        elif file_size_bytes >= RANGED_DOWNLOAD_THRESHOLD and not PIPELINE_TRANSFERS:
+            # Large object: parallel range GETs into memory, read without a copy
+            logger.debug("Downloading input in parallel ranges")
+            input_object["Body"].close()
+            input_stream = cast(
+                BinaryIO,
+                MemoryReader(
+                    download_ranged(
+                        s3_client, input_bucket, input_key, file_size_bytes, etag=etag
+                    )
+                ),
+            )
+        else:
+            # Small object (or pipelined mode): stream the GET already open
+            logger.debug("Streaming input with a single GET")
+            input_stream = input_object["Body"]
 
         # 7. Process the file
         # TODO: Replace this with your actual processing logic
         emitter.emit_progress("Processing file...")
 
-        print("Starting file processing...")
+        logger.debug("Starting file processing...")
         processing_start = time.time()
 
-        # TODO: Call your processing function here
-        local_output_path = TMP_DIR / f"output_{job_id}.xlsx"
-        result = process_file(
-            input_path=local_input_path,
-            output_path=local_output_path,
-            config=stage_config,
-            emitter=emitter,
-        )
-
-        processing_time_ms = int((time.time() - processing_start) * 1000)
-        print(f"Processing completed in {processing_time_ms}ms")
-
-        # 8. Upload output file to S3
-        emitter.emit_progress("Uploading output to S3...")
-
-        print(f"Uploading {local_output_path} to s3://{output_bucket}/{output_key}")
-        s3_client.upload_file(str(local_output_path), output_bucket, output_key)
-
-        output_file_size = local_output_path.stat().st_size
-        print(f"Uploaded {output_file_size:,} bytes")
-
-        # 9. Clean up temporary files
-        try:
-            local_input_path.unlink()
-            local_output_path.unlink()
-            print("Cleaned up temporary files")
-        except Exception as e:
-            print(f"Warning: Failed to clean up temp files: {e}")
-
-        # 10. Calculate total processing time
+        uploader: Optional[MultipartUploadWriter] = None
+        if PIPELINE_TRANSFERS:
+            # Download ahead and upload finished parts while processing runs
+            input_stream = cast(BinaryIO, PrefetchingReader(input_stream))
+            uploader = MultipartUploadWriter(s3_client, output_bucket, output_key)
+            output_stream: IO[bytes] = cast(IO[bytes], uploader)
+        else:
+            # Output is buffered in memory and only spills to /tmp past SPOOL_MAX_BYTES
+            output_stream = SpooledTemporaryFile(
+                max_size=SPOOL_MAX_BYTES, dir=str(TMP_DIR)
+            )
+
+        with input_stream, output_stream:
+            # TODO: Call your processing function here
+            result = process_file(
+                input_stream=input_stream,
+                output_stream=output_stream,
+                config=stage_config,
+                emitter=emitter,
+            )
+
+            processing_time_ms = int((time.time() - processing_start) * 1000)
+            logger.debug("Processing completed in %dms", processing_time_ms)
+
+            # 8. Upload output stream to S3
+            emitter.emit_progress("Uploading output to S3...")
+
+            logger.debug("Uploading output to s3://%s/%s", output_bucket, output_key)
+            # Sizes come from the streams themselves - no stat() on /tmp files
+            if uploader is not None:
+                uploader.complete()
+                output_file_size = uploader.bytes_written
+            else:
+                # Seek to the end: process_file may have left the position elsewhere
+                output_file_size = output_stream.seek(0, io.SEEK_END)
+                output_stream.seek(0)
+                s3_client.upload_fileobj(
+                    output_stream, output_bucket, output_key, Config=TRANSFER_CONFIG
+                )
+            logger.debug("Uploaded %d bytes", output_file_size)
+
+        # 9. Calculate total processing time
         total_time_ms = int((time.time() - start_time) * 1000)
 
-        # 11. Build metadata
+        # 10. Build metadata
         metadata = {
             "processing_time_ms": total_time_ms,
             "input_file_size_bytes": file_size_bytes,
@@ -185,14 +387,15 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if reference_date:
             metadata["reference_date"] = reference_date
 
-        # 12. Emit success event
+        # 11. Emit success event (the output is in S3, whatever happens to the
+        # downstream dispatch below)
         emitter.emit_success(
             "Processing completed successfully",
             output_key=output_key,
             metadata=metadata,
         )
 
-        # 13. Return success response
+        # 12. Build success response
         response = {
             "status": "success",
             "output_bucket": output_bucket,
@@ -200,17 +403,43 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             "metadata": metadata,
         }
 
-        print(f"Success! Total processing time: {total_time_ms}ms")
-        print(f"Response: {json.dumps(response)}")
+        # 13. Start downstream stages (asynchronous, not awaited). A failed
+        # dispatch doesn't undo this stage: it is reported next to the success,
+        # with the stages still to start, so a retry can start just those
+        # without redoing the work here or starting the others twice.
+        if downstream:
+            started: List[str] = []
+            try:
+                _fanout_invoke(downstream, started=started)
+            except Exception as e:
+                logger.exception("Failed to start downstream stages")
+                response["dispatch_error"] = str(e)
+                response["dispatch_error_type"] = type(e).__name__
+                response["next_stages_not_started"] = [
+                    invocation["function_name"]
+                    for invocation in downstream[len(started) :]
+                ]
+            else:
+                # A new dict: the queued success event may not be serialized yet
+                response["metadata"] = {
+                    **metadata,
+                    "next_stages_dispatched": len(downstream),
+                }
+            if stage_config.get("dispatch_mode") == "async":
+                response["dispatch_mode"] = "async"
+                response["next_stages"] = started
+
+        _attach_terminal_event(response, emitter)
+
+        logger.info("Job %s succeeded in %dms", job_id, total_time_ms)
+        _log_json("Response: %s", response)
 
         return response
 
     except FileNotFoundError as e:
         error_msg = f"File not found: {str(e)}"
-        print(f"ERROR: {error_msg}")
-        if "emitter" in locals():
-            emitter.emit_error(error_msg, error_type="FileNotFoundError")
-        return {
+        logger.error(error_msg)
+        response = {
             "status": "error",
             "error": error_msg,
             "error_type": "FileNotFoundError",
@@ -219,30 +448,31 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 "input_key": event.get("input_key"),
             },
         }
+        if "emitter" in locals():
+            emitter.emit_error(error_msg, error_type="FileNotFoundError")
+            _attach_terminal_event(response, emitter)
+        return response
 
     except ValueError as e:
         error_msg = f"Invalid value: {str(e)}"
-        print(f"ERROR: {error_msg}")
-        if "emitter" in locals():
-            emitter.emit_error(error_msg, error_type="ValueError")
-        return {
+        logger.error(error_msg)
+        response = {
             "status": "error",
             "error": error_msg,
             "error_type": "ValueError",
             "metadata": {"job_id": event.get("job_id")},
         }
+        if "emitter" in locals():
+            emitter.emit_error(error_msg, error_type="ValueError")
+            _attach_terminal_event(response, emitter)
+        return response
 
     except Exception as e:
-        # Processing error
+        # Processing error (logged with traceback)
         error_msg = str(e)
-        error_trace = traceback.format_exc()
-        print(f"ERROR: {error_msg}")
-        print(f"Traceback:\n{error_trace}")
+        logger.exception(error_msg)
 
-        if "emitter" in locals():
-            emitter.emit_error(error_msg, error_type=type(e).__name__)
-
-        return {
+        response = {
             "status": "error",
             "error": error_msg,
             "error_type": type(e).__name__,
@@ -252,24 +482,236 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 "processing_time_ms": int((time.time() - start_time) * 1000),
             },
         }
+        if "emitter" in locals():
+            emitter.emit_error(error_msg, error_type=type(e).__name__)
+            _attach_terminal_event(response, emitter)
+
+        return response
+
+    finally:
+        # Deliver queued events before the container is frozen
+        if "emitter" in locals():
+            if emitter.terminal_emitted:
+                timeout = TERMINAL_EVENT_FLUSH_TIMEOUT_SECONDS
+            else:
+                timeout = EVENT_FLUSH_TIMEOUT_SECONDS
+            if not emitter.flush(timeout=timeout):
+                logger.warning("Timed out delivering queued events")
+
+
+def _log_json(message: str, obj: Any) -> None:
+    """Log obj as JSON at DEBUG; logging must never fail the invocation."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    try:
+        text = json_dumps(obj)
+    except (TypeError, ValueError):
+        # Not JSON-encodable (e.g. a set in process_file's metadata)
+        text = repr(obj)
+    logger.debug(message, text)
+
+
+def _attach_terminal_event(
+    response: Dict[str, Any], emitter: BackgroundEventEmitter
+) -> None:
+    """
+    Add the held-back success/error event to the response (RETURN_TERMINAL_EVENT).
+
+    The state machine publishes response["terminal_event"] with an
+    arn:aws:states:::events:putEvents task (Entries.$: "States.Array($.terminal_event)"),
+    so the Lambda skips that PutEvents round trip.
+    """
+    if not RETURN_TERMINAL_EVENT:
+        return
+    # Built synchronously by emit_success/emit_error: nothing to wait for
+    entry = emitter.terminal_event
+    if entry is not None:
+        # Step Functions takes Detail as an object and serializes it itself
+        response["terminal_event"] = {**entry, "Detail": json.loads(entry["Detail"])}
+
+
+def _next_stage_invocations(
+    next_stages: List[Any], event: Dict[str, Any], output_key: str
+) -> List[Dict[str, Any]]:
+    """
+    Build the invocations that start the downstream stages on this stage's output.
+
+    Each next stage is a function name, or a dict with "function_name" and
+    optional "stage_id", "stage_config" and "output_key". Without an
+    output_key a stage writes to jobs/{job_id}/{stage_id}/output.xlsx, so
+    sibling stages never share an output file.
+
+    Args:
+        next_stages: stage_config.next_stages (plus stage_config.next_stage)
+        event: This stage's event
+        output_key: This stage's output key, the downstream stages' input
+
+    Returns:
+        Items for _fanout_invoke()
+
+    Raises:
+        ValueError: If a stage is malformed, or would write to this stage's
+            output or to the same key as another stage
+    """
+    invocations = []
+    output_keys = {output_key}
+    for stage in next_stages:
+        if isinstance(stage, str):
+            stage = {"function_name": stage}
+        if not isinstance(stage, dict) or not isinstance(
+            stage.get("function_name"), str
+        ):
+            raise ValueError(
+                f"Next stage must be a function name or a dict with one: {stage!r}"
+            )
+        stage_id = stage.get("stage_id") or _function_name(stage["function_name"])
+        # TODO: Update file extension as needed (.xlsx, .json, .pdf, etc.)
+        next_output_key = (
+            stage.get("output_key") or f"jobs/{event['job_id']}/{stage_id}/output.xlsx"
+        )
+        if next_output_key in output_keys:
+            raise ValueError(
+                f"Next stage {stage_id} would overwrite s3://"
+                f"{event['output_bucket']}/{next_output_key}; give it its own "
+                "stage_id or output_key"
+            )
+        output_keys.add(next_output_key)
+
+        payload = {
+            "invocation_type": "direct",
+            "job_id": event["job_id"],
+            "input_bucket": event["output_bucket"],
+            "input_key": output_key,
+            "output_bucket": event["output_bucket"],
+            "output_key": next_output_key,
+            "customer_tier": event.get("customer_tier", "standard"),
+            "stage_config": {**stage.get("stage_config", {}), "stage_id": stage_id},
+        }
+        if event.get("reference_date"):
+            payload["reference_date"] = event["reference_date"]
+        invocation = {"function_name": stage["function_name"], "payload": payload}
+        _check_downstream(invocation)
+        invocations.append(invocation)
+    return invocations
+
+
+def _function_name(identifier: str) -> str:
+    """Function name from a Lambda function name, partial ARN or ARN (qualifier dropped)."""
+    return identifier.rsplit(":function:", 1)[-1].split(":")[0]
+
+
+def _check_downstream(invocation: Dict[str, Any]) -> None:
+    """
+    Reject an invocation this function would never dispatch itself.
+
+    Raises:
+        ValueError: If the target is not in DOWNSTREAM_FUNCTIONS or the
+            payload is not a direct stage invocation
+    """
+    # Exact match: a listed name must not let an ARN in another account through
+    if invocation["function_name"] not in DOWNSTREAM_FUNCTIONS:
+        raise ValueError(
+            f"Downstream function not allowed: {invocation['function_name']} "
+            "(add it to DOWNSTREAM_FUNCTIONS)"
+        )
+    if invocation["payload"].get("invocation_type") != "direct":
+        raise ValueError("Downstream invocations must be direct stage invocations")
+
+
+def _get_lambda_client() -> Any:
+    """Return the module-level Lambda client, creating it on first use."""
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = boto3.client("lambda", config=BOTO_CONFIG)
+    return _lambda_client
+
+
+def _fanout_invoke(
+    invocations: List[Dict[str, Any]],
+    relay: bool = True,
+    started: Optional[List[str]] = None,
+) -> None:
+    """
+    Invoke many Lambda functions asynchronously in O(sqrt(N)) time per caller.
+
+    Up to FANOUT_DIRECT_LIMIT targets are invoked directly. Larger fan-outs are
+    split into ceil(sqrt(N)) groups, and each group is handed to a relay
+    invocation of this function ("fanout" invocation type), which invokes its
+    children directly. Every call uses InvocationType="Event", so no caller is
+    billed for waiting on a downstream function.
+
+    Every target must be in DOWNSTREAM_FUNCTIONS; relay events arrive from
+    outside, so they are checked again on each hop.
+
+    Args:
+        invocations: Items of the form {"function_name": str, "payload": dict}
+        relay: Split large fan-outs into relay groups (False on a relay hop,
+            which invokes its children itself whatever their number)
+        started: Filled, in order, with the function names of the targets
+            invoked or handed to a relay, so a caller can tell how far a
+            failed fan-out got
+
+    Raises:
+        ValueError: If any invocation fails _check_downstream (nothing is sent)
+    """
+    for invocation in invocations:
+        _check_downstream(invocation)
+
+    client = _get_lambda_client()
+    relay_function = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+
+    if not relay or len(invocations) <= FANOUT_DIRECT_LIMIT or not relay_function:
+        for invocation in invocations:
+            client.invoke(
+                FunctionName=invocation["function_name"],
+                InvocationType="Event",
+                Payload=json_dumps(invocation["payload"]),
+            )
+            if started is not None:
+                started.append(invocation["function_name"])
+        return
+
+    group_size = math.ceil(len(invocations) / math.ceil(math.sqrt(len(invocations))))
+    for start in range(0, len(invocations), group_size):
+        client.invoke(
+            FunctionName=relay_function,
+            InvocationType="Event",
+            Payload=json_dumps(
+                {
+                    "invocation_type": "fanout",
+                    "children": invocations[start : start + group_size],
+                }
+            ),
+        )
+        if started is not None:
+            started.extend(
+                child["function_name"]
+                for child in invocations[start : start + group_size]
+            )
 
 
 def process_file(
-    input_path: Path,
-    output_path: Path,
+    input_stream: BinaryIO,
+    output_stream: IO[bytes],
     config: Dict[str, Any],
-    emitter: ServiceEventEmitter,
+    emitter: EventEmitter,
 ) -> Dict[str, Any]:
     """
     TODO: Replace this with your actual file processing logic.
 
     This is a placeholder function that demonstrates the expected structure.
 
+    The input is streamed straight from S3 and is NOT seekable. If your library
+    needs random access (zip-based formats, PDFs, images), buffer it first with
+    ``io.BytesIO(input_stream.read())``. Inputs fetched in parallel ranges
+    arrive as a seekable MemoryReader instead; check ``hasattr(input_stream,
+    "getbuffer")`` to work on the downloaded memoryview without copying it.
+
     Args:
-        input_path: Path to input file
-        output_path: Path to save output file
+        input_stream: Readable binary stream of the S3 input object
+        output_stream: Writable binary stream that is uploaded to S3 afterwards
         config: Stage configuration from VeloFlow
-        emitter: ServiceEventEmitter for real-time progress updates
+        emitter: EventEmitter for real-time progress updates
 
     Returns:
         Dict containing processing results and metadata
@@ -285,13 +727,10 @@ def process_file(
     # 4. Write output file
 
     # Simulate processing for template
-    import time
-
     time.sleep(2)  # Remove this in your implementation
 
-    # Create a simple output file (replace with actual output)
-    with open(output_path, "wb") as f:
-        f.write(b"TODO: Replace with actual output")
+    # Write the output (replace with actual output)
+    output_stream.write(b"TODO: Replace with actual output")
 
     emitter.emit_progress("Processing complete")
 
@@ -318,6 +757,8 @@ if __name__ == "__main__":
         "stage_config": {},
     }
 
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+
     # Run handler
     result = lambda_handler(test_event, None)
     print(f"\nResult: {json.dumps(result, indent=2)}")
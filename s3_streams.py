@@ -0,0 +1,500 @@
+"""Pipelined and parallel S3 transfers for VeloFlow services.
+
+download_ranged() fetches a large object with concurrent byte-range GETs,
+which scales with the number of connections up to the Lambda's network
+bandwidth instead of being capped by a single GET. download_ranged_to_file()
+does the same into a preallocated file for objects too large to hold in memory.
+MemoryReader exposes an in-memory download as a stream without copying it.
+
+The streams let a service overlap download, processing and upload instead of
+running them back to back. The handler's process_file() keeps its
+input_stream/output_stream signature; only the stream objects change:
+
+- PrefetchingReader: downloads the S3 object body ahead of the consumer on a
+  worker thread, handing over CHUNK_SIZE chunks through a bounded queue.
+- MultipartUploadWriter: sends every full CHUNK_SIZE part to S3 as a multipart
+  upload part on a worker thread while the producer keeps writing.
+
+The total latency drops to roughly max(download, process, upload) when
+process_file consumes input and produces output incrementally. It brings no
+benefit when process_file reads the whole input before writing anything.
+
+Usage:
+    from s3_streams import MultipartUploadWriter, PrefetchingReader
+
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    with PrefetchingReader(body) as reader, MultipartUploadWriter(
+        s3_client, out_bucket, out_key
+    ) as writer:
+        for chunk in iter(lambda: reader.read(1024 * 1024), b""):
+            writer.write(transform(chunk))
+        writer.complete()  # closing without complete() aborts the upload
+"""
+
+import io
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Chunk handed between pipeline stages. S3 multipart parts must be at least
+# 5 MB (except the last one), so 8 MB works for both directions.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Chunks buffered between two stages before the producer blocks (bounds memory)
+QUEUE_DEPTH = 4
+
+# One worker for the downloader and one for the uploader. Module scope so the
+# threads are reused across warm invocations.
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="s3-pipeline")
+
+# Number of byte ranges fetched concurrently by download_ranged()
+RANGE_CONCURRENCY = 8
+
+# Bytes copied per read while filling a range into the destination buffer
+_RANGE_READ_SIZE = 1024 * 1024
+
+_RANGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=RANGE_CONCURRENCY, thread_name_prefix="s3-range"
+)
+
+# How often blocked queue operations re-check for cancellation (seconds)
+_POLL_INTERVAL = 0.1
+
+_EOF = object()
+
+
+def _fetch_ranges(
+    s3_client: Any,
+    bucket: str,
+    key: str,
+    size: int,
+    parts: int,
+    write_at: Callable[[int, bytes], None],
+    etag: Optional[str] = None,
+) -> None:
+    """Fetch an object in concurrent ranges, passing each chunk to write_at(offset, chunk).
+
+    Returns (or raises the first error) only once no range is running any
+    more, so the caller can release the destination straight away.
+    """
+    if size == 0:
+        return
+    part_size = -(-size // parts)  # ceil division
+    # Every range must come from the same object version
+    if_match = {"IfMatch": etag} if etag else {}
+    failed = threading.Event()
+
+    def fetch(start: int) -> None:
+        end = min(start + part_size, size) - 1
+        body = s3_client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **if_match
+        )["Body"]
+        offset = start
+        with body:
+            for chunk in iter(lambda: body.read(_RANGE_READ_SIZE), b""):
+                if failed.is_set():
+                    return  # another range failed, the download is discarded
+                write_at(offset, chunk)
+                offset += len(chunk)
+        if offset != end + 1:
+            raise IOError(
+                f"Short read for s3://{bucket}/{key} bytes {start}-{end}: "
+                f"got {offset - start} bytes"
+            )
+
+    futures = [
+        _RANGE_EXECUTOR.submit(fetch, start) for start in range(0, size, part_size)
+    ]
+    _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+    if not_done:
+        # A range failed: drop the queued ones and stop the running ones
+        # instead of leaving them to tie up the executor
+        failed.set()
+        for future in not_done:
+            future.cancel()
+        wait(not_done)
+    for future in futures:
+        if not future.cancelled():
+            future.result()
+
+
+def download_ranged(
+    s3_client: Any,
+    bucket: str,
+    key: str,
+    size: int,
+    parts: int = RANGE_CONCURRENCY,
+    etag: Optional[str] = None,
+) -> bytearray:
+    """
+    Download an object into memory with concurrent byte-range GETs.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Source bucket
+        key: Source key
+        size: Object size in bytes
+        parts: Number of ranges to split the object into
+        etag: ETag every range must match (fails with a 412 error if the
+            object is overwritten mid-download)
+
+    Returns:
+        bytearray holding the whole object
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+
+    def write_at(offset: int, chunk: bytes) -> None:
+        view[offset : offset + len(chunk)] = chunk
+
+    _fetch_ranges(s3_client, bucket, key, size, parts, write_at, etag)
+    return buffer
+
+
+def download_ranged_to_file(
+    s3_client: Any,
+    bucket: str,
+    key: str,
+    size: int,
+    path: str,
+    parts: int = RANGE_CONCURRENCY,
+    etag: Optional[str] = None,
+) -> None:
+    """
+    Download an object into a local file with concurrent byte-range GETs.
+
+    The file is preallocated to its final size with posix_fallocate, so the
+    ranges are written with pwrite into blocks that already exist instead of
+    extending the file a page at a time while the writers contend on it.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Source bucket
+        key: Source key
+        size: Object size in bytes
+        path: Destination file, created or truncated
+        parts: Number of ranges to split the object into
+        etag: ETag every range must match (see download_ranged)
+    """
+    fd = os.open(path, os.O_CREAT | os.O_TRUNC | os.O_RDWR, 0o600)
+    try:
+        if size and hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+
+        def write_at(offset: int, chunk: bytes) -> None:
+            os.pwrite(fd, chunk, offset)
+
+        _fetch_ranges(s3_client, bucket, key, size, parts, write_at, etag)
+    except BaseException:
+        # Don't leave a partial download behind in /tmp. _fetch_ranges only
+        # raises once every range has stopped, so no writer can still pwrite
+        # to fd (or to whatever file reuses its number) after this close.
+        os.close(fd)
+        os.unlink(path)
+        raise
+    os.close(fd)
+
+
+class MemoryReader(io.RawIOBase):
+    """Read-only, seekable stream over a buffer, without copying it.
+
+    io.BytesIO(bytearray) copies the whole buffer up front. This reader serves
+    reads straight from a memoryview, and getbuffer() hands the view itself to
+    consumers that can work on memory directly.
+    """
+
+    def __init__(self, buffer: Any):
+        """
+        Wrap a buffer.
+
+        Args:
+            buffer: bytes-like object, e.g. the bytearray from download_ranged()
+        """
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def getbuffer(self) -> memoryview:
+        """Return a read-only view of the whole buffer."""
+        return self._view.toreadonly()
+
+    def readinto(self, buffer: Any) -> int:
+        chunk = self._view[self._pos : self._pos + len(buffer)]
+        size = len(chunk)
+        buffer[:size] = chunk
+        self._pos += size
+        return size
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        data = self._view[self._pos : end].tobytes()
+        self._pos += len(data)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def _put_unless_stopped(
+    q: "queue.Queue[Any]", item: Any, stop: threading.Event
+) -> bool:
+    """Put an item on a bounded queue, giving up once stop is set."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class PrefetchingReader(io.RawIOBase):
+    """Read-only stream that downloads ahead of its consumer on a worker thread."""
+
+    def __init__(
+        self, body: Any, chunk_size: int = CHUNK_SIZE, depth: int = QUEUE_DEPTH
+    ):
+        """
+        Start prefetching a stream.
+
+        Args:
+            body: Source stream, typically the StreamingBody of get_object()
+            chunk_size: Bytes read from the source per chunk
+            depth: Maximum number of chunks buffered ahead of the consumer
+        """
+        super().__init__()
+        self._body = body
+        self._chunk_size = chunk_size
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._future = _EXECUTOR.submit(self._download)
+        # Only close the source once the worker is done reading from it
+        self._future.add_done_callback(lambda _: self._body.close())
+
+    def _download(self) -> None:
+        """Worker: move chunks from the source stream onto the queue."""
+        try:
+            while not self._stop.is_set():
+                chunk = self._body.read(self._chunk_size)
+                if not chunk:
+                    break
+                if not _put_unless_stopped(self._queue, chunk, self._stop):
+                    return
+        except Exception as e:
+            # Re-raised in the consumer thread by _next_chunk()
+            _put_unless_stopped(self._queue, e, self._stop)
+            return
+        _put_unless_stopped(self._queue, _EOF, self._stop)
+
+    def _next_chunk(self) -> Optional[bytes]:
+        """Block until the next chunk arrives; None at end of stream."""
+        if self._eof:
+            return None
+        item = self._queue.get()
+        if item is _EOF:
+            self._eof = True
+            return None
+        if isinstance(item, Exception):
+            self._eof = True
+            raise item
+        return item
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if not self._pending:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def readall(self) -> bytes:
+        # Join whole chunks instead of RawIOBase's small fixed-size reads
+        parts = [bytes(self._pending)]
+        self._pending = memoryview(b"")
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return b"".join(parts)
+            parts.append(chunk)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+        super().close()
+
+
+class MultipartUploadWriter(io.RawIOBase):
+    """Write-only stream that uploads to S3 while the producer keeps writing.
+
+    Full parts are uploaded with upload_part on a worker thread. Outputs smaller
+    than one part are sent with a single put_object() call on complete().
+    Call complete() to finish the upload; closing the stream without it aborts
+    the upload so a failed job never leaves a partial object behind.
+    """
+
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket: str,
+        key: str,
+        part_size: int = CHUNK_SIZE,
+        depth: int = QUEUE_DEPTH,
+    ):
+        """
+        Prepare an upload. Nothing is sent to S3 until the first part is full.
+
+        Args:
+            s3_client: boto3 S3 client
+            bucket: Destination bucket
+            key: Destination key
+            part_size: Bytes per multipart part (S3 minimum is 5 MB)
+            depth: Maximum number of parts queued ahead of the uploader
+        """
+        super().__init__()
+        self.bytes_written = 0
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Union[str, int]]] = []
+        self._error: Optional[BaseException] = None
+        self._future: Optional[Any] = None
+        self._completed = False
+
+    def _upload(self) -> None:
+        """Worker: upload queued parts in order."""
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = self._queue.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _EOF:
+                    return
+                part_number = len(self._parts) + 1
+                response = self._s3_client.upload_part(
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    PartNumber=part_number,
+                    Body=item,
+                )
+                self._parts.append(
+                    {"ETag": response["ETag"], "PartNumber": part_number}
+                )
+        except Exception as e:
+            # Surfaced to the producer on its next write() or complete()
+            self._error = e
+            self._stop.set()
+
+    def _check_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _send_part(self, part: bytes) -> None:
+        """Queue a part, starting the multipart upload on the first one."""
+        if self._future is None:
+            response = self._s3_client.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key
+            )
+            self._upload_id = response["UploadId"]
+            self._future = _EXECUTOR.submit(self._upload)
+        if not _put_unless_stopped(self._queue, part, self._stop):
+            self._check_error()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError("write to closed MultipartUploadWriter")
+        self._check_error()
+        size = len(data)
+        self._buffer += data
+        self.bytes_written += size
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[: self._part_size])
+            del self._buffer[: self._part_size]
+            self._send_part(part)
+        return size
+
+    def complete(self) -> None:
+        """Upload the remaining bytes and finish the upload."""
+        self._check_error()
+        if self._future is None:
+            # Everything fit in one part - a single PUT is cheaper than multipart
+            self._s3_client.put_object(
+                Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer)
+            )
+        else:
+            if self._buffer:
+                self._send_part(bytes(self._buffer))
+            _put_unless_stopped(self._queue, _EOF, self._stop)
+            self._future.result()
+            self._check_error()
+            self._s3_client.complete_multipart_upload(
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+        self._completed = True
+
+    def abort(self) -> None:
+        """Stop uploading and discard any parts already sent."""
+        self._stop.set()
+        if self._upload_id is not None:
+            try:
+                self._s3_client.abort_multipart_upload(
+                    Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                logger.warning("Failed to abort multipart upload: %s", e)
+            self._upload_id = None
+
+    def close(self) -> None:
+        if not self.closed and not self._completed:
+            self.abort()
+        super().close()
@@ -27,21 +27,234 @@ Usage:
         'Failed to process page 3',
         error_type='TableExtractionError'
     )
+
+To keep EventBridge calls off the critical path, wrap the emitter in a
+BackgroundEventEmitter and flush it before the Lambda returns:
+
+    emitter = BackgroundEventEmitter(ServiceEventEmitter(...))
+    emitter.emit_progress('Processing page 1 of 5...')  # returns immediately
+    emitter.flush(timeout=0.5)
+
+Set SKIP_UNROUTED_EVENTS=true to stop sending event types that no enabled
+rule on the bus matches (needs events:ListRules; the answer is cached for
+RULE_CACHE_TTL_SECONDS per container).
+
+Inside a Step Functions workflow, pass return_terminal_event=True to keep
+the success/error event on emitter.terminal_event instead of sending it. The
+handler returns it, and a following arn:aws:states:::events:putEvents task
+publishes it, so the Lambda is not billed for that round trip.
+
+Chatty services can also send up to MAX_BATCH_SIZE events per PutEvents
+request. Success and error events always flush the batch; use the emitter as
+a context manager (or call flush()) so trailing progress events are sent:
+
+    with ServiceEventEmitter(..., batch_size=10) as emitter:
+        for page in pages:
+            emitter.emit_progress(f'Processing page {page}...')
 """
 
 import json
+import logging
 import os
-from datetime import datetime
-from typing import Any, Dict, Optional
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
+
+# Optional faster JSON encoder for event details, also used by the Lambda
+# handler for log lines and invoke payloads (pip install orjson)
+try:
+    import orjson
+
+    def json_dumps(obj: Any) -> str:
+        # Like json.dumps, turn non-str keys (e.g. {1: ...} metadata) into strings
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+except ImportError:
+
+    def json_dumps(obj: Any) -> str:
+        # Compact, with non-ASCII text left as is, the way orjson writes it
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+# Read once per container; an emitter can still be given its own bus
+EVENT_BUS_NAME = os.environ.get("EVENT_BUS_NAME")
+
+# Opt-in: drop events that no rule on the bus would deliver anywhere
+SKIP_UNROUTED_EVENTS = os.environ.get("SKIP_UNROUTED_EVENTS", "false").lower() == "true"
+
+# How long a formatted event timestamp is reused (1 ms)
+_TIMESTAMP_REUSE_NS = 1_000_000
+
+# Most entries a single PutEvents request accepts
+MAX_BATCH_SIZE = 10
+
+# Event types that end a job; they flush a batched emitter immediately
+_TERMINAL_EVENT_TYPES = frozenset({"service.completed", "service.failed"})
+
+# Keep the connection to EventBridge alive between events and warm invocations
+# so bursts of progress updates don't each pay a TCP/TLS handshake
+EVENTS_CLIENT_CONFIG = Config(
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    max_pool_connections=50,
+)
+
+# How long a "does any rule route this event type" answer is trusted (seconds)
+RULE_CACHE_TTL_SECONDS = 300
+
+# (event bus, detail type) -> (monotonic time checked, has matching rule)
+_rule_cache: Dict[Tuple[str, str], Tuple[float, bool]] = {}
+
+# EventBridge client shared by all emitters in this container (see _get_events_client)
+_events_client = None
+
+
+def _get_events_client() -> Any:
+    """
+    Return the process-wide EventBridge client, creating it on first use.
+
+    Building a boto3 client is expensive (credential resolution, endpoint and
+    service model loading), so it is done once per container instead of once
+    per emitter and reused across warm invocations.
+    """
+    global _events_client
+    if _events_client is None:
+        _events_client = boto3.client("events", config=EVENTS_CLIENT_CONFIG)
+    return _events_client
+
+
+# Last formatted timestamp and the monotonic time it was made (see _utc_timestamp)
+_timestamp_cache: Tuple[int, str] = (-_TIMESTAMP_REUSE_NS, "")
+
+
+def _pattern_allows(pattern: Dict[str, Any], field: str, value: str) -> bool:
+    """Whether an event pattern could match value in field (unknown filters count as a match)."""
+    allowed = pattern.get(field)
+    if allowed is None:
+        return True
+    if not isinstance(allowed, list):
+        return True
+    return any(item == value or not isinstance(item, str) for item in allowed)
+
+
+def _has_rules_for(client: Any, event_bus_name: str, event_type: str) -> bool:
+    """
+    Whether any enabled rule on the bus could match a veloflow.service event of this type.
+
+    The answer is cached per container for RULE_CACHE_TTL_SECONDS. If the rules
+    cannot be listed (e.g. missing events:ListRules permission), events are
+    assumed to be routed so nothing is dropped.
+    """
+    key = (event_bus_name, event_type)
+    now = time.monotonic()
+    cached = _rule_cache.get(key)
+    if cached is not None and now - cached[0] < RULE_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    routed = False
+    try:
+        kwargs = {"EventBusName": event_bus_name}
+        while not routed:
+            response = client.list_rules(**kwargs)
+            for rule in response.get("Rules", []):
+                if rule.get("State") != "ENABLED" or not rule.get("EventPattern"):
+                    continue
+                pattern = json.loads(rule["EventPattern"])
+                if _pattern_allows(
+                    pattern, "source", "veloflow.service"
+                ) and _pattern_allows(pattern, "detail-type", event_type):
+                    routed = True
+                    break
+            if "NextToken" not in response:
+                break
+            kwargs["NextToken"] = response["NextToken"]
+    except Exception as e:
+        logger.warning("Could not list EventBridge rules, emitting anyway: %s", e)
+        routed = True
+
+    _rule_cache[key] = (now, routed)
+    return routed
+
+
+def _utc_timestamp() -> str:
+    """
+    Current UTC time as ISO 8601 with a Z suffix (e.g. 2025-01-15T10:30:00.123456Z).
+
+    Bursts of events reuse the last formatted value for up to a millisecond
+    instead of building and formatting a new datetime for every event.
+    """
+    global _timestamp_cache
+    now = time.monotonic_ns()
+    made_at, formatted = _timestamp_cache
+    if now - made_at >= _TIMESTAMP_REUSE_NS:
+        formatted = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        _timestamp_cache = (now, formatted)
+    return formatted
+
+
+class EventEmitter(Protocol):
+    """What processing code needs from an emitter, sent inline or in the background."""
+
+    def emit_progress(
+        self,
+        message: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
+    ) -> None: ...
+
+    def emit_success(
+        self,
+        message: str,
+        output_key: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
+    ) -> None: ...
+
+    def emit_error(
+        self,
+        message: str,
+        error_type: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
+    ) -> None: ...
+
 
 class ServiceEventEmitter:
     """Emits real-time progress events to VeloFlow EventBridge event bus."""
 
-    def __init__(self, job_id: str, service_id: str, stage_id: Optional[str] = None):
+    __slots__ = (
+        "job_id",
+        "service_id",
+        "stage_id",
+        "batch_size",
+        "event_bus_name",
+        "skip_unrouted",
+        "return_terminal_event",
+        "terminal_event",
+        "_pending",
+        "_lock",
+        "_base_entry",
+        "_detail_prefix",
+        "_events_client",
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        service_id: str,
+        stage_id: Optional[str] = None,
+        batch_size: int = 1,
+        return_terminal_event: bool = False,
+        event_bus_name: Optional[str] = None,
+    ):
         """
         Initialize the event emitter.
 
@@ -49,17 +262,66 @@ class ServiceEventEmitter:
             job_id: VeloFlow job ID
             service_id: Unique identifier for this service (e.g., 'pdf-to-xls-vision-v1')
             stage_id: Optional workflow stage ID
+            batch_size: Events sent per PutEvents request (1 to MAX_BATCH_SIZE).
+                Above 1, events are held until the batch is full, a success or
+                error event is emitted, or flush() is called.
+            return_terminal_event: Keep the success/error event on
+                terminal_event instead of sending it, for the caller to return
+                to a Step Functions events:putEvents task.
+            event_bus_name: Event bus to publish to (default: EVENT_BUS_NAME)
         """
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+
         self.job_id = job_id
         self.service_id = service_id
         self.stage_id = stage_id
-        self.event_bus_name = os.environ.get("EVENT_BUS_NAME")
+        self.batch_size = batch_size
+        self.event_bus_name = event_bus_name or EVENT_BUS_NAME
+        self.skip_unrouted = SKIP_UNROUTED_EVENTS
+        self.return_terminal_event = return_terminal_event
+        self.terminal_event: Optional[Dict[str, str]] = None
+        # (detail type, Detail JSON) of events not sent yet; PutEvents entries
+        # are only built when a batch is flushed
+        self._pending: List[Tuple[str, str]] = []
+        # Guards _pending: a BackgroundEventEmitter's worker and the caller's
+        # thread (holding back a terminal event) may both reach it
+        self._lock = threading.Lock()
+
+        # Entry fields shared by every event from this emitter
+        self._base_entry: Dict[str, Any] = {
+            "Source": "veloflow.service",
+            "EventBusName": self.event_bus_name,
+        }
+
+        # The job context is the same in every event: serialize it once and
+        # splice it in front of each event's own fields (see _emit_event)
+        context = {"job_id": job_id, "service_id": service_id}
+        if stage_id:
+            context["stage_id"] = stage_id
+        self._detail_prefix = json_dumps(context)[:-1]
 
-        # Initialize EventBridge client
-        self.events_client = boto3.client("events")
+        # Container-wide EventBridge client, looked up on first emission
+        self._events_client: Optional[Any] = None
+
+    @property
+    def events_client(self) -> Any:
+        """EventBridge client, created on first use so idle emitters cost nothing."""
+        if self._events_client is None:
+            self._events_client = _get_events_client()
+        return self._events_client
+
+    def __enter__(self) -> "ServiceEventEmitter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.flush()
 
     def emit_progress(
-        self, message: str, metadata: Optional[Dict[str, Any]] = None
+        self,
+        message: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
     ) -> None:
         """
         Emit a progress event.
@@ -67,25 +329,25 @@ class ServiceEventEmitter:
         Args:
             message: Progress message to display to user
             metadata: Optional additional metadata
+            timestamp: When the event happened (default: now)
         """
-        self._emit_event(
-            event_type="service.progress",
-            detail={
-                "job_id": self.job_id,
-                "service_id": self.service_id,
-                "stage_id": self.stage_id,
-                "status": "in_progress",
-                "message": message,
-                "metadata": metadata,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-            },
-        )
+        detail: Dict[str, Any] = {
+            "status": "in_progress",
+            "message": message,
+            "timestamp": timestamp or _utc_timestamp(),
+        }
+
+        if metadata is not None:
+            detail["metadata"] = metadata
+
+        self._emit_event(event_type="service.progress", detail=detail)
 
     def emit_success(
         self,
         message: str,
         output_key: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
     ) -> None:
         """
         Emit a success event.
@@ -94,17 +356,16 @@ class ServiceEventEmitter:
             message: Success message to display to user
             output_key: Optional S3 key of the output file
             metadata: Optional additional metadata
+            timestamp: When the event happened (default: now)
         """
-        detail = {
-            "job_id": self.job_id,
-            "service_id": self.service_id,
-            "stage_id": self.stage_id,
+        detail: Dict[str, Any] = {
             "status": "success",
             "message": message,
-            "metadata": metadata,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": timestamp or _utc_timestamp(),
         }
 
+        if metadata is not None:
+            detail["metadata"] = metadata
         if output_key:
             detail["output_key"] = output_key
 
@@ -115,6 +376,7 @@ class ServiceEventEmitter:
         message: str,
         error_type: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[str] = None,
     ) -> None:
         """
         Emit an error event.
@@ -123,17 +385,16 @@ class ServiceEventEmitter:
             message: Error message to display to user
             error_type: Optional error type/classification
             metadata: Optional additional error context
+            timestamp: When the event happened (default: now)
         """
-        detail = {
-            "job_id": self.job_id,
-            "service_id": self.service_id,
-            "stage_id": self.stage_id,
+        detail: Dict[str, Any] = {
             "status": "error",
             "message": message,
-            "metadata": metadata,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": timestamp or _utc_timestamp(),
         }
 
+        if metadata is not None:
+            detail["metadata"] = metadata
         if error_type:
             detail["error_type"] = error_type
 
@@ -145,59 +406,204 @@ class ServiceEventEmitter:
 
         Args:
             event_type: Event detail type (e.g., 'service.progress')
-            detail: Event detail payload
+            detail: Event-specific fields, added to the job context fields
         """
+        # Held back for the state machine to send after the Lambda returns.
+        # Building it needs no bus and no network, so it is always available.
+        hold = self.return_terminal_event and event_type in _TERMINAL_EVENT_TYPES
+
+        try:
+            detail_json = self._detail_prefix + "," + json_dumps(detail)[1:]
+        except Exception as e:
+            # Unserializable metadata must not break the service either
+            logger.warning("Unexpected error emitting event: %s", e)
+            return
+
+        if hold:
+            entry = dict(self._base_entry, DetailType=event_type, Detail=detail_json)
+            if not self.event_bus_name:
+                del entry["EventBusName"]
+            self.terminal_event = entry
+            if self._pending:
+                self.flush()
+            return
+
         # Skip if no event bus configured
         if not self.event_bus_name:
-            print(
-                f"Warning: EVENT_BUS_NAME not set, skipping event emission: {event_type}"
+            logger.warning(
+                "EVENT_BUS_NAME not set, skipping event emission: %s", event_type
             )
             return
 
-        try:
-            # Prepare event entry
-            event_entry = {
-                "Source": "veloflow.service",
-                "DetailType": event_type,
-                "Detail": json.dumps(detail),
-                "EventBusName": self.event_bus_name,
-            }
+        if self.skip_unrouted and not _has_rules_for(
+            self.events_client, self.event_bus_name, event_type
+        ):
+            return
+
+        with self._lock:
+            self._pending.append((event_type, detail_json))
+            full = len(self._pending) >= self.batch_size
+
+        if full or event_type in _TERMINAL_EVENT_TYPES:
+            self.flush()
 
+    def flush(self) -> None:
+        """Send any events held back by batching in one PutEvents request."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        entries = [
+            dict(self._base_entry, DetailType=event_type, Detail=detail_json)
+            for event_type, detail_json in pending
+        ]
+
+        try:
             # Publish to EventBridge
-            response = self.events_client.put_events(Entries=[event_entry])
+            response = self.events_client.put_events(Entries=entries)
 
-            # Check for failures
+            # Check for failures (results are in the same order as the entries)
             if response.get("FailedEntryCount", 0) > 0:
-                failed = response.get("Entries", [{}])[0]
-                error_code = failed.get("ErrorCode", "Unknown")
-                error_msg = failed.get("ErrorMessage", "Unknown error")
-                print(f"Warning: Failed to emit event: {error_code} - {error_msg}")
-            else:
-                print(f"✓ Emitted event: {event_type} - {detail.get('message', '')}")
+                for entry, result in zip(entries, response.get("Entries", [])):
+                    if result.get("ErrorCode"):
+                        logger.warning(
+                            "Failed to emit event %s: %s - %s",
+                            entry["DetailType"],
+                            result["ErrorCode"],
+                            result.get("ErrorMessage", "Unknown error"),
+                        )
+            elif logger.isEnabledFor(logging.DEBUG):
+                for entry in entries:
+                    logger.debug("Emitted event: %s", entry["DetailType"])
 
         except ClientError as e:
             # Don't fail the Lambda if event emission fails
             error_code = e.response.get("Error", {}).get("Code", "Unknown")
             error_msg = e.response.get("Error", {}).get("Message", str(e))
-            print(
-                f"Warning: Failed to emit event to EventBridge: {error_code} - {error_msg}"
+            logger.warning(
+                "Failed to emit event to EventBridge: %s - %s", error_code, error_msg
             )
 
         except Exception as e:
             # Catch any other exceptions to prevent breaking the service
-            print(f"Warning: Unexpected error emitting event: {str(e)}")
+            logger.warning("Unexpected error emitting event: %s", e)
+
+
+# Pending emissions, drained in order by a single daemon thread per container
+_emit_queue: "queue.Queue[Tuple[Callable[..., None], tuple, dict]]" = queue.Queue()
+_emit_worker: Optional[threading.Thread] = None
+_emit_worker_lock = threading.Lock()
+
+
+def _drain_emit_queue() -> None:
+    """Daemon thread: send queued events one at a time."""
+    while True:
+        emit, args, kwargs = _emit_queue.get()
+        try:
+            emit(*args, **kwargs)
+        except Exception as e:
+            logger.warning("Unexpected error emitting event: %s", e)
+
+
+def _ensure_emit_worker() -> None:
+    """Start the daemon thread on first use; it survives warm invocations."""
+    global _emit_worker
+    with _emit_worker_lock:
+        if _emit_worker is None or not _emit_worker.is_alive():
+            _emit_worker = threading.Thread(
+                target=_drain_emit_queue, name="event-emitter", daemon=True
+            )
+            _emit_worker.start()
+
+
+class BackgroundEventEmitter:
+    """
+    Adapter that sends a ServiceEventEmitter's events from a background thread.
+
+    emit_* calls only enqueue the event, so progress updates no longer block
+    processing on an EventBridge round trip. Events are still sent in order,
+    stamped with the time they were emitted, not the time they were sent.
+    Call flush() before the Lambda returns: the container is frozen afterwards
+    and anything still queued would only be sent on the next invocation.
+    """
+
+    def __init__(self, emitter: ServiceEventEmitter):
+        """
+        Wrap an emitter.
+
+        Args:
+            emitter: ServiceEventEmitter that actually sends the events
+        """
+        self.emitter = emitter
+        # Set once a success/error event is emitted, so the caller knows the
+        # final flush must deliver every event queued before it: those must
+        # not be left behind, nor arrive after a held-back terminal event
+        self.terminal_emitted = False
+        _ensure_emit_worker()
+
+    @property
+    def terminal_event(self) -> Optional[Dict[str, str]]:
+        """Held-back success/error entry (see ServiceEventEmitter), set on emit."""
+        return self.emitter.terminal_event
+
+    def _enqueue(self, emit: Callable[..., None], args: tuple, kwargs: dict) -> None:
+        # Stamp the event now: the worker may only get to it much later
+        kwargs.setdefault("timestamp", _utc_timestamp())
+        _emit_queue.put((emit, args, kwargs))
+
+    def emit_progress(self, *args: Any, **kwargs: Any) -> None:
+        """Queue a progress event (see ServiceEventEmitter.emit_progress)."""
+        self._enqueue(self.emitter.emit_progress, args, kwargs)
+
+    def _emit_terminal(
+        self, emit: Callable[..., None], args: tuple, kwargs: dict
+    ) -> None:
+        self.terminal_emitted = True
+        if self.emitter.return_terminal_event:
+            # Only builds terminal_event, so do it right here: the caller
+            # returns it at once, whether or not the queue has drained
+            kwargs.setdefault("timestamp", _utc_timestamp())
+            emit(*args, **kwargs)
+            return
+        self._enqueue(emit, args, kwargs)
+
+    def emit_success(self, *args: Any, **kwargs: Any) -> None:
+        """Queue a success event (see ServiceEventEmitter.emit_success)."""
+        self._emit_terminal(self.emitter.emit_success, args, kwargs)
+
+    def emit_error(self, *args: Any, **kwargs: Any) -> None:
+        """Queue an error event (see ServiceEventEmitter.emit_error)."""
+        self._emit_terminal(self.emitter.emit_error, args, kwargs)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every event queued so far has been sent, including events
+        held back by a batching emitter.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the queue drained, False if the timeout expired first
+        """
+        drained = threading.Event()
+        _emit_queue.put((self.emitter.flush, (), {}))
+        _emit_queue.put((drained.set, (), {}))
+        return drained.wait(timeout)
 
 
 # Example usage
 if __name__ == "__main__":
-    # Set mock environment variable for testing
-    os.environ["EVENT_BUS_NAME"] = "veloflow-dev-event-bus"
+    # Show each emitted event (logged at DEBUG)
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "DEBUG"))
 
     # Create emitter
     emitter = ServiceEventEmitter(
         job_id="test-job-123",
         service_id="pdf-to-xls-vision-v1",
         stage_id="vision-conversion",
+        event_bus_name="veloflow-dev-event-bus",
     )
 
     # Test emissions
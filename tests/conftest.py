@@ -0,0 +1,140 @@
+"""Shared pytest fixtures for the service tests."""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, create_autospec
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+
+# Make the service modules at the repository root importable, once per session
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def handler_module():
+    """The lambda_handler module, imported on first use rather than at collection.
+
+    Importing it builds boto3 clients and reads the environment, which a
+    ``pytest -k`` run that deselects every handler test shouldn't pay for.
+    """
+    import lambda_handler
+
+    return lambda_handler
+
+
+@pytest.fixture(scope="session")
+def handler(handler_module):
+    """The Lambda entry point, lambda_handler.lambda_handler."""
+    return handler_module.lambda_handler
+
+
+@pytest.fixture
+def lambda_tmp(monkeypatch, tmp_path):
+    """Point the handler's TMP_DIR (Lambda's /tmp) at a per-test directory."""
+    monkeypatch.setattr("lambda_handler.TMP_DIR", tmp_path)
+    return tmp_path
+
+
+# S3 client methods the handler and s3_streams call
+S3_CLIENT_METHODS = [
+    "get_object",
+    "put_object",
+    "upload_fileobj",
+    "create_multipart_upload",
+    "upload_part",
+    "complete_multipart_upload",
+    "abort_multipart_upload",
+]
+
+
+@pytest.fixture
+def happy_mocks(monkeypatch):
+    """Mock the handler's S3 client, process_file and ServiceEventEmitter.
+
+    The mocks are specced, so calling anything the real objects don't have
+    fails the test. process_file succeeds with empty metadata unless a test
+    overrides it.
+    """
+    import lambda_handler
+    from service_event_emitter import ServiceEventEmitter
+
+    s3 = Mock(spec=S3_CLIENT_METHODS)
+    process = create_autospec(
+        lambda_handler.process_file, return_value={"success": True, "metadata": {}}
+    )
+    emitter = create_autospec(ServiceEventEmitter)
+    # Plain attributes keep their real defaults instead of truthy mocks
+    emitter.return_value.return_terminal_event = False
+    emitter.return_value.terminal_event = None
+    monkeypatch.setattr("lambda_handler.s3_client", s3)
+    monkeypatch.setattr("lambda_handler.process_file", process)
+    monkeypatch.setattr("lambda_handler.ServiceEventEmitter", emitter)
+    return SimpleNamespace(
+        s3=s3,
+        process=process,
+        emitter=emitter,
+        emitter_instance=emitter.return_value,
+    )
+
+
+@pytest.fixture(scope="session")
+def s3_test_client():
+    """Real boto3 S3 client with dummy credentials, built once per session."""
+    return boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",  # nosec B106
+    )
+
+
+@pytest.fixture
+def uploaded_keys():
+    """Output keys the handler passed to upload_fileobj, in call order."""
+    return []
+
+
+@pytest.fixture
+def stubbed_s3(monkeypatch, happy_mocks, s3_test_client, uploaded_keys):
+    """Serve the handler's S3 API calls from a botocore Stubber.
+
+    Requests are validated against the real S3 model, so a wrong parameter
+    name fails the test. upload_fileobj runs the transfer manager (threads,
+    a varying number of calls), so it stays a mock on the client that records
+    each key in uploaded_keys.
+    """
+    upload_fileobj = Mock(
+        side_effect=lambda fileobj, bucket, key, **kwargs: uploaded_keys.append(key)
+    )
+    monkeypatch.setattr(s3_test_client, "upload_fileobj", upload_fileobj)
+    monkeypatch.setattr("lambda_handler.s3_client", s3_test_client)
+    with Stubber(s3_test_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture(scope="module")
+def moto_s3():
+    """In-memory S3 (moto) with input-bucket/input.xlsx and an empty output-bucket.
+
+    Started once per test module in each pytest-xdist worker process;
+    objects written by one test stay visible to later tests on the same
+    worker, so tests should use their own output keys.
+    """
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="input-bucket")
+        client.create_bucket(Bucket="output-bucket")
+        client.put_object(Bucket="input-bucket", Key="input.xlsx", Body=b"x" * 1024)
+        yield client
+
+
+@pytest.fixture
+def real_s3(monkeypatch, happy_mocks, moto_s3):
+    """Run the handler's real S3 download and upload against moto."""
+    monkeypatch.setattr("lambda_handler.s3_client", moto_s3)
+    return moto_s3
@@ -6,289 +6,233 @@ This is a template test file. Customize it for your specific service:
 - Add tests for custom configuration handling
 """
 
-import os
+import io
+import json
+import logging
 import sys
-from unittest.mock import MagicMock, patch
+import threading
+from types import MappingProxyType, ModuleType
+from unittest.mock import patch
 
 import pytest
+from botocore.response import StreamingBody
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep every handler test off the real /tmp (see conftest.py)
+pytestmark = pytest.mark.usefixtures("lambda_tmp")
 
-import lambda_handler  # noqa: E402
-from lambda_handler import lambda_handler as handler  # noqa: E402
 
+def add_input_responses(stubber, bucket, key, body=b"x" * 1024):
+    """Queue the get_object() response for an input object."""
+    stubber.add_response(
+        "get_object",
+        {
+            "Body": StreamingBody(io.BytesIO(body), len(body)),
+            "ContentLength": len(body),
+            "ETag": '"input-etag"',
+        },
+        {"Bucket": bucket, "Key": key},
+    )
 
-def create_mock_path(path_str):
-    """Create a mock Path object that doesn't touch filesystem.
 
-    Note: /tmp is the standard temporary directory for AWS Lambda - using it in tests
-    is safe and mirrors the actual Lambda environment.
-    """
-    from pathlib import Path as RealPath
-
-    real_path = RealPath(path_str)
+def stub_input_object(mock_s3, body=b"x" * 1024):
+    """Make get_object() on a mock S3 client serve body."""
+    mock_s3.get_object.return_value = {
+        "Body": io.BytesIO(body),
+        "ContentLength": len(body),
+        "ETag": '"input-etag"',
+    }
 
-    mock_path = MagicMock()
-    mock_path.name = real_path.name
-    mock_path.__str__ = MagicMock(return_value=str(real_path))
-    mock_path.__truediv__ = lambda self, other: create_mock_path(str(real_path / other))
 
-    # Mock filesystem operations
-    mock_stat = MagicMock()
-    mock_stat.st_size = 1024
-    mock_path.stat = MagicMock(return_value=mock_stat)
-    mock_path.unlink = MagicMock()
+def assert_happy(emitter):
+    """Assert the handler reported progress for each stage and then success."""
+    assert emitter.emit_success.called
+    assert emitter.emit_progress.call_count >= 4
 
-    return mock_path
 
+def assert_error(result, error_type, *needles):
+    """Assert result is an error of error_type whose message contains needles.
 
-def path_constructor_mock(path_arg):
-    """Mock for Path() constructor."""
-    return create_mock_path(str(path_arg))
+    Needles are matched case-insensitively.
+    """
+    assert result["status"] == "error"
+    assert result["error_type"] == error_type
+    message = result["error"].lower()
+    assert all(needle.lower() in message for needle in needles), result["error"]
+
+
+BASE_EVENT = MappingProxyType(
+    {
+        "invocation_type": "direct",
+        "job_id": "test-123",
+        "input_bucket": "bucket",
+        "input_key": "key",
+        "output_bucket": "output",
+    }
+)
+
+# The same event pointed at the objects created by the moto_s3 fixture
+MOTO_EVENT = MappingProxyType(
+    {
+        **BASE_EVENT,
+        "input_bucket": "input-bucket",
+        "input_key": "input.xlsx",
+        "output_bucket": "output-bucket",
+    }
+)
 
 
 class TestEventValidation:
     """Test event validation logic."""
 
-    def test_missing_invocation_type(self):
-        """Test that missing invocation_type returns error."""
-        event = {
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "key",
-            "output_bucket": "output",
-        }
-        result = handler(event, None)
-
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValidationError"
-        assert "invocation type" in result["error"].lower()
+    @pytest.mark.parametrize(
+        "overrides,missing_field,expected_in_error",
+        [
+            ({}, "invocation_type", "invocation type"),
+            ({"invocation_type": "async"}, None, "direct"),
+            ({}, "job_id", "job_id"),
+            ({}, "input_bucket", "input_bucket"),
+            ({}, "input_key", "input_key"),
+            ({}, "output_bucket", "output_bucket"),
+        ],
+        ids=[
+            "missing_invocation_type",
+            "invalid_invocation_type",
+            "missing_job_id",
+            "missing_input_bucket",
+            "missing_input_key",
+            "missing_output_bucket",
+        ],
+    )
+    def test_invalid_event(self, overrides, missing_field, expected_in_error, handler):
+        """Test that a malformed event returns a ValidationError naming the problem."""
+        event = {**BASE_EVENT, **overrides}
+        event.pop(missing_field, None)
 
-    def test_invalid_invocation_type(self):
-        """Test that non-direct invocation type returns error."""
-        event = {
-            "invocation_type": "async",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "key",
-            "output_bucket": "output",
-        }
         result = handler(event, None)
 
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValidationError"
-        assert "direct" in result["error"].lower()
-
-    def test_missing_job_id(self):
-        """Test that missing job_id returns error."""
-        event = {
-            "invocation_type": "direct",
-            "input_bucket": "bucket",
-            "input_key": "key",
-            "output_bucket": "output",
-        }
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
-
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValidationError"
-        assert "job_id" in result["error"]
+        assert_error(result, "ValidationError", expected_in_error)
+
+
+class TestLogLevel:
+    """Test reading LOG_LEVEL, which must never break a cold start."""
+
+    @pytest.mark.parametrize(
+        "name,level",
+        [
+            ("DEBUG", logging.DEBUG),
+            ("debug", logging.DEBUG),
+            ("warn", logging.WARNING),
+            (" Error ", logging.ERROR),
+            ("verbose", logging.INFO),
+            ("", logging.INFO),
+        ],
+    )
+    def test_log_level(self, name, level, handler_module):
+        """Test that any case is accepted and unknown names fall back to INFO."""
+        assert handler_module._log_level(name) == level
+
+
+class TestTransferClient:
+    """Test choosing the S3 transfer client, which must never fail at import."""
+
+    @pytest.mark.parametrize(
+        "version,supported",
+        [("0.19.18", True), ("0.20.1", True), ("0.19.17", False), ("0.19.dev", False)],
+    )
+    def test_crt_needs_minimum_version(
+        self, version, supported, monkeypatch, handler_module
+    ):
+        """Test that an awscrt too old for boto3 falls back to the classic client."""
+        awscrt = ModuleType("awscrt")
+        awscrt.__version__ = version
+        crt = ModuleType("s3transfer.crt")
+        crt.CRTTransferManager = object
+        monkeypatch.setitem(sys.modules, "awscrt", awscrt)
+        monkeypatch.setitem(sys.modules, "awscrt.s3", ModuleType("awscrt.s3"))
+        monkeypatch.setitem(sys.modules, "s3transfer.crt", crt)
 
-    def test_missing_input_bucket(self):
-        """Test that missing input_bucket returns error."""
-        event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_key": "key",
-            "output_bucket": "output",
-        }
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        assert handler_module._crt_transfer_supported() is supported
 
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValidationError"
-        assert "input_bucket" in result["error"]
+    def test_crt_not_installed(self, monkeypatch, handler_module):
+        """Test that a missing awscrt means the classic client."""
+        monkeypatch.setitem(sys.modules, "awscrt", None)
 
-    def test_missing_input_key(self):
-        """Test that missing input_key returns error."""
-        event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "output_bucket": "output",
-        }
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
-
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValidationError"
-        assert "input_key" in result["error"]
-
-    def test_missing_output_bucket(self):
-        """Test that missing output_bucket returns error."""
-        event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "key",
-        }
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
-
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValidationError"
-        assert "output_bucket" in result["error"]
+        assert handler_module._crt_transfer_supported() is False
 
 
 class TestOutputKeyHandling:
     """Test output_key handling for multi-stage workflows."""
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_uses_provided_output_key(self, mock_emitter, mock_process, mock_s3):
+    def test_uses_provided_output_key(
+        self, stubbed_s3, uploaded_keys, handler, handler_module
+    ):
         """Test that provided output_key is used (multi-stage workflow)."""
         event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "input-bucket",
-            "input_key": "input.xlsx",
-            "output_bucket": "output-bucket",
+            **MOTO_EVENT,
             "output_key": "jobs/test-123/stage-2/custom-output.xlsx",
         }
 
-        # Mock file operations
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
-        mock_process.return_value = {"success": True, "metadata": {}}
-
-        # Mock emitter
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
+        add_input_responses(stubbed_s3, "input-bucket", "input.xlsx")
 
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(event, None)
 
         assert result["status"] == "success"
         assert result["output_key"] == "jobs/test-123/stage-2/custom-output.xlsx"
 
         # Verify upload was called with the provided output_key
-        assert mock_s3.upload_file.called
-        upload_call = mock_s3.upload_file.call_args
-        assert upload_call[0][2] == "jobs/test-123/stage-2/custom-output.xlsx"
-
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_fallback_output_key_legacy_workflow(
-        self, mock_emitter, mock_process, mock_s3
-    ):
+        assert uploaded_keys == ["jobs/test-123/stage-2/custom-output.xlsx"]
+        upload_kwargs = stubbed_s3.client.upload_fileobj.call_args.kwargs
+        assert upload_kwargs["Config"] is handler_module.TRANSFER_CONFIG
+
+    def test_fallback_output_key_legacy_workflow(self, real_s3, happy_mocks, handler):
         """Test fallback output_key for legacy single-stage workflows."""
         event = {
-            "invocation_type": "direct",
+            **MOTO_EVENT,
             "job_id": "test-456",
-            "input_bucket": "input-bucket",
-            "input_key": "input.xlsx",
-            "output_bucket": "output-bucket",
             # No output_key provided
         }
 
-        # Mock file operations
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
-        mock_process.return_value = {"success": True, "metadata": {}}
+        def convert(input_stream, output_stream, config, emitter):
+            output_stream.write(input_stream.read().upper())
+            return {"success": True, "metadata": {}}
 
-        # Mock emitter
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
+        happy_mocks.process.side_effect = convert
 
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(event, None)
 
         assert result["status"] == "success"
         # Default fallback uses generic extension - customize this based on your service
         assert "jobs/test-456" in result["output_key"]
 
+        # The output really landed in S3 under the fallback key
+        output = real_s3.get_object(Bucket="output-bucket", Key=result["output_key"])
+        assert output["Body"].read() == b"X" * 1024
+
 
 class TestOptionalParameters:
     """Test handling of optional parameters."""
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_default_customer_tier(self, mock_emitter, mock_process, mock_s3):
+    def test_default_customer_tier(self, real_s3, handler):
         """Test that customer_tier defaults to 'standard'."""
         event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "key",
-            "output_bucket": "output",
+            **MOTO_EVENT,
+            "job_id": "test-tier-123",
         }
 
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
-        mock_process.return_value = {"success": True, "metadata": {}}
-
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
-
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(event, None)
 
         assert result["status"] == "success"
         assert result["metadata"]["customer_tier"] == "standard"
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_reference_date_included_in_metadata(
-        self, mock_emitter, mock_process, mock_s3
-    ):
+    def test_reference_date_included_in_metadata(self, real_s3, handler):
         """Test that reference_date is included in metadata when provided."""
         event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "key",
-            "output_bucket": "output",
+            **MOTO_EVENT,
+            "job_id": "test-date-123",
             "reference_date": "2025-01-15",
         }
 
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
-        mock_process.return_value = {"success": True, "metadata": {}}
-
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
-
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(event, None)
 
         assert result["status"] == "success"
         assert result["metadata"]["reference_date"] == "2025-01-15"
@@ -297,104 +241,53 @@ class TestOptionalParameters:
 class TestErrorHandling:
     """Test error handling for different exception types."""
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_file_not_found_error(self, mock_emitter, mock_s3):
-        """Test FileNotFoundError handling."""
-        event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "missing.xlsx",
-            "output_bucket": "output",
-        }
-
-        mock_s3.download_file.side_effect = FileNotFoundError("File not found in S3")
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
-
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
-
-        assert result["status"] == "error"
-        assert result["error_type"] == "FileNotFoundError"
-        assert "not found" in result["error"].lower()
-        assert mock_emitter_instance.emit_error.called
-
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_value_error_handling(self, mock_emitter, mock_process, mock_s3):
-        """Test ValueError handling from process_file."""
-        event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "invalid.xlsx",
-            "output_bucket": "output",
-        }
-
-        mock_s3.download_file = MagicMock()
-        mock_process.side_effect = ValueError("Invalid file format")
-
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
-
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
-
-        assert result["status"] == "error"
-        assert result["error_type"] == "ValueError"
-        assert "Invalid value" in result["error"]
-        assert mock_emitter_instance.emit_error.called
-
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_general_exception_handling(self, mock_emitter, mock_process, mock_s3):
-        """Test generic Exception handling."""
-        event = {
-            "invocation_type": "direct",
-            "job_id": "test-123",
-            "input_bucket": "bucket",
-            "input_key": "file.xlsx",
-            "output_bucket": "output",
-        }
-
-        mock_s3.download_file = MagicMock()
-        mock_process.side_effect = RuntimeError("Unexpected processing error")
-
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
+    @pytest.mark.parametrize(
+        "exc,error_type,needle,raise_on",
+        [
+            (
+                FileNotFoundError("File not found in S3"),
+                "FileNotFoundError",
+                "not found",
+                "download",
+            ),
+            (
+                ValueError("Invalid file format"),
+                "ValueError",
+                "Invalid value",
+                "process",
+            ),
+            (
+                RuntimeError("Unexpected processing error"),
+                "RuntimeError",
+                "Unexpected processing error",
+                "process",
+            ),
+        ],
+        ids=["file_not_found", "value_error", "general_exception"],
+    )
+    def test_error_response(
+        self, happy_mocks, exc, error_type, needle, raise_on, handler
+    ):
+        """Test that a failed download or process_file returns a typed error."""
+        if raise_on == "download":
+            happy_mocks.s3.get_object.side_effect = exc
+        else:
+            stub_input_object(happy_mocks.s3)
+            happy_mocks.process.side_effect = exc
 
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(BASE_EVENT, None)
 
-        assert result["status"] == "error"
-        assert result["error_type"] == "RuntimeError"
-        assert "Unexpected processing error" in result["error"]
-        assert mock_emitter_instance.emit_error.called
+        assert_error(result, error_type, needle)
+        assert happy_mocks.emitter_instance.emit_error.called
 
 
 class TestSuccessfulExecution:
     """Test successful execution flow."""
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_complete_success_flow(self, mock_emitter, mock_process, mock_s3):
+    def test_complete_success_flow(self, stubbed_s3, happy_mocks, handler):
         """Test complete successful execution with all metadata."""
         event = {
-            "invocation_type": "direct",
+            **BASE_EVENT,
             "job_id": "test-success-123",
             "input_bucket": "input-bucket",
             "input_key": "uploads/sample.xlsx",
@@ -402,18 +295,14 @@ class TestSuccessfulExecution:
             "output_key": "jobs/test-success-123/output.xlsx",
             "reference_date": "2025-01-15",
             "customer_tier": "premium",
-            "stage_config": {
-                "stage_id": "processing",
-                "custom_param": "value",
-            },
+            "stage_config": {"stage_id": "processing", "custom_param": "value"},
         }
 
-        # Mock S3 operations
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
+        # Stub S3 operations
+        add_input_responses(stubbed_s3, "input-bucket", "uploads/sample.xlsx")
 
         # Mock process_file return
-        mock_process.return_value = {
+        happy_mocks.process.return_value = {
             "success": True,
             "metadata": {
                 "records_processed": 42,
@@ -421,15 +310,7 @@ class TestSuccessfulExecution:
             },
         }
 
-        # Mock emitter
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
-
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(event, None)
 
         # Verify success response
         assert result["status"] == "success"
@@ -438,91 +319,556 @@ class TestSuccessfulExecution:
 
         # Verify metadata
         assert "processing_time_ms" in result["metadata"]
-        assert "input_file_size_bytes" in result["metadata"]
-        assert "output_file_size_bytes" in result["metadata"]
+        assert result["metadata"]["input_file_size_bytes"] == 1024
+        assert result["metadata"]["output_file_size_bytes"] == 0
         assert result["metadata"]["customer_tier"] == "premium"
         assert result["metadata"]["reference_date"] == "2025-01-15"
         assert result["metadata"]["records_processed"] == 42
 
         # Verify progress events were emitted
-        assert mock_emitter_instance.emit_progress.call_count >= 4
-        assert mock_emitter_instance.emit_success.called
+        assert_happy(happy_mocks.emitter_instance)
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
-    def test_config_passed_to_process_file(self, mock_emitter, mock_process, mock_s3):
+    def test_config_passed_to_process_file(self, happy_mocks, handler):
         """Test that stage_config is properly passed to process_file."""
         event = {
-            "invocation_type": "direct",
+            **BASE_EVENT,
             "job_id": "test-config-123",
-            "input_bucket": "bucket",
             "input_key": "file.xlsx",
-            "output_bucket": "output",
             "stage_config": {
                 "template_name": "custom_template",
                 "custom_param": "value",
             },
         }
 
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
-        mock_process.return_value = {"success": True, "metadata": {}}
+        stub_input_object(happy_mocks.s3)
 
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
-
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            result = handler(event, None)
+        result = handler(event, None)
 
         assert result["status"] == "success"
+        assert_happy(happy_mocks.emitter_instance)
 
         # Verify process_file was called with correct config
-        call_args = mock_process.call_args
-        config_arg = call_args[1]["config"]
+        config_arg = happy_mocks.process.call_args.kwargs["config"]
         assert config_arg["template_name"] == "custom_template"
         assert config_arg["custom_param"] == "value"
 
+    @pytest.mark.parametrize(
+        "extra_metadata",
+        [{1: "page one"}, {"pages": {1, 2}}],
+        ids=["non_str_key", "not_json"],
+    )
+    def test_debug_logging_never_fails_job(
+        self, extra_metadata, happy_mocks, handler, caplog
+    ):
+        """Test that logging the response at DEBUG can't turn success into failure."""
+        caplog.set_level(logging.DEBUG)
+        stub_input_object(happy_mocks.s3)
+        happy_mocks.process.return_value = {"success": True, "metadata": extra_metadata}
+
+        result = handler(dict(BASE_EVENT), None)
+
+        assert result["status"] == "success"
+        assert not happy_mocks.emitter_instance.emit_error.called
+        assert "Response: " in caplog.text
+
+    def test_output_size_independent_of_stream_position(self, happy_mocks, handler):
+        """Test that output size is the full spool length even after a seek."""
+        event = {**BASE_EVENT, "job_id": "test-size-123", "input_key": "file.xlsx"}
+
+        def write_then_rewind(input_stream, output_stream, config, emitter):
+            output_stream.write(b"0123456789")
+            output_stream.seek(0)
+            output_stream.write(b"AB")
+            return {"success": True, "metadata": {}}
+
+        uploaded = []
+        stub_input_object(happy_mocks.s3)
+        happy_mocks.s3.upload_fileobj.side_effect = (
+            lambda f, *args, **kwargs: uploaded.append(f.read())
+        )
+        happy_mocks.process.side_effect = write_then_rewind
+
+        result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert result["metadata"]["output_file_size_bytes"] == 10
+        assert uploaded == [b"AB23456789"]
+
+    @patch("lambda_handler.RANGED_DOWNLOAD_THRESHOLD", 16)
+    @patch("lambda_handler.download_ranged")
+    def test_large_input_uses_ranged_download(
+        self, mock_download_ranged, happy_mocks, handler
+    ):
+        """Test that inputs above the threshold are fetched in parallel ranges."""
+        event = {**BASE_EVENT, "job_id": "test-ranged-123", "input_key": "large.bin"}
+
+        received = []
+
+        def read_input(input_stream, output_stream, config, emitter):
+            received.append(bytes(input_stream.getbuffer()))
+            return {"success": True, "metadata": {}}
+
+        stub_input_object(happy_mocks.s3, b"?" * 32)
+        mock_download_ranged.return_value = bytearray(b"r" * 32)
+        happy_mocks.process.side_effect = read_input
+
+        result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert result["metadata"]["input_file_size_bytes"] == 32
+        mock_download_ranged.assert_called_once_with(
+            happy_mocks.s3, "bucket", "large.bin", 32, etag='"input-etag"'
+        )
+        # The single GET is only used to learn the size, then closed
+        assert happy_mocks.s3.get_object.return_value["Body"].closed
+        assert received == [b"r" * 32]
+
+    def test_oversized_input_downloaded_to_tmp(self, lambda_tmp, happy_mocks, handler):
+        """Test that inputs above the memory cap are read from an unlinked /tmp file."""
+        event = {**BASE_EVENT, "job_id": "test-huge-123", "input_key": "file.xlsx"}
+
+        stub_input_object(happy_mocks.s3, b"?" * 100)
+        received = {}
+
+        def download(s3_client, bucket, key, size, path, etag):
+            with open(path, "wb") as f:
+                f.write(b"y" * size)
+
+        def read_input(input_stream, output_stream, config, emitter):
+            received["data"] = input_stream.read()
+            return {"success": True, "metadata": {}}
+
+        happy_mocks.process.side_effect = read_input
+
+        with patch("lambda_handler.SPOOL_MAX_BYTES", 16), patch(
+            "lambda_handler.download_ranged_to_file", side_effect=download
+        ):
+            result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert received["data"] == b"y" * 100
+        assert happy_mocks.s3.get_object.return_value["Body"].closed
+        assert list(lambda_tmp.iterdir()) == []
+
+    @patch("lambda_handler.PIPELINE_TRANSFERS", True)
+    def test_pipelined_transfers(self, happy_mocks, handler):
+        """Test that pipelined mode streams output through a multipart writer."""
+        event = {
+            **BASE_EVENT,
+            "job_id": "test-pipeline-123",
+            "input_key": "file.xlsx",
+            "output_key": "jobs/test-pipeline-123/output.xlsx",
+        }
+
+        def echo_input(input_stream, output_stream, config, emitter):
+            output_stream.write(input_stream.read())
+            return {"success": True, "metadata": {}}
+
+        stub_input_object(happy_mocks.s3, b"streamed")
+        happy_mocks.process.side_effect = echo_input
+
+        result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert result["metadata"]["output_file_size_bytes"] == 8
+        happy_mocks.s3.put_object.assert_called_once_with(
+            Bucket="output",
+            Key="jobs/test-pipeline-123/output.xlsx",
+            Body=b"streamed",
+        )
+        assert not happy_mocks.s3.upload_fileobj.called
+
 
 class TestServiceEventEmitter:
     """Test ServiceEventEmitter integration."""
 
-    @patch("lambda_handler.s3_client")
-    @patch("lambda_handler.process_file")
-    @patch("lambda_handler.ServiceEventEmitter")
     def test_emitter_initialized_with_correct_params(
-        self, mock_emitter, mock_process, mock_s3
+        self, happy_mocks, handler, handler_module
     ):
         """Test that ServiceEventEmitter is initialized with correct parameters."""
         event = {
-            "invocation_type": "direct",
+            **BASE_EVENT,
             "job_id": "test-emitter-123",
-            "input_bucket": "bucket",
             "input_key": "file.xlsx",
-            "output_bucket": "output",
             "stage_config": {"stage_id": "custom-stage-id"},
         }
 
-        mock_s3.download_file = MagicMock()
-        mock_s3.upload_file = MagicMock()
-        mock_process.return_value = {"success": True, "metadata": {}}
-        mock_emitter_instance = MagicMock()
-        mock_emitter.return_value = mock_emitter_instance
+        stub_input_object(happy_mocks.s3)
 
-        # Mock Path to avoid filesystem operations
-        with patch("lambda_handler.Path", side_effect=path_constructor_mock), patch(
-            "lambda_handler.TMP_DIR", create_mock_path("/tmp")  # nosec B108
-        ):
-            handler(event, None)
+        handler(event, None)
 
         # Verify emitter was initialized correctly
-        mock_emitter.assert_called_once_with(
+        happy_mocks.emitter.assert_called_once_with(
             job_id="test-emitter-123",
-            service_id=lambda_handler.SERVICE_ID,
+            service_id=handler_module.SERVICE_ID,
             stage_id="custom-stage-id",
+            return_terminal_event=False,
+        )
+
+    def test_terminal_event_flushed_with_long_timeout(
+        self, happy_mocks, handler, handler_module
+    ):
+        """Test that the final flush waits long enough for the success event."""
+        stub_input_object(happy_mocks.s3)
+
+        with patch.object(
+            handler_module.BackgroundEventEmitter, "flush", return_value=True
+        ) as flush:
+            handler(BASE_EVENT, None)
+
+        flush.assert_called_once_with(
+            timeout=handler_module.TERMINAL_EVENT_FLUSH_TIMEOUT_SECONDS
+        )
+
+    @patch("lambda_handler.RETURN_TERMINAL_EVENT", True)
+    def test_progress_drained_before_terminal_event_returned(
+        self, happy_mocks, handler, handler_module
+    ):
+        """Test that queued progress gets the long timeout when the event is held."""
+        stub_input_object(happy_mocks.s3)
+        happy_mocks.emitter_instance.return_terminal_event = True
+
+        with patch.object(
+            handler_module.BackgroundEventEmitter, "flush", return_value=True
+        ) as flush:
+            handler(BASE_EVENT, None)
+
+        flush.assert_called_once_with(
+            timeout=handler_module.TERMINAL_EVENT_FLUSH_TIMEOUT_SECONDS
+        )
+
+    @patch("lambda_handler.RETURN_TERMINAL_EVENT", True)
+    def test_terminal_event_returned(self, happy_mocks, handler):
+        """Test that the held-back success event is returned for Step Functions."""
+        event = {**BASE_EVENT, "job_id": "test-terminal-123", "input_key": "file.xlsx"}
+
+        stub_input_object(happy_mocks.s3)
+        happy_mocks.emitter_instance.return_terminal_event = True
+        happy_mocks.emitter_instance.terminal_event = {
+            "Source": "veloflow.service",
+            "DetailType": "service.completed",
+            "Detail": '{"job_id":"test-terminal-123","status":"success"}',
+            "EventBusName": "veloflow-test-event-bus",
+        }
+
+        result = handler(event, None)
+
+        assert result["terminal_event"] == {
+            "Source": "veloflow.service",
+            "DetailType": "service.completed",
+            "Detail": {"job_id": "test-terminal-123", "status": "success"},
+            "EventBusName": "veloflow-test-event-bus",
+        }
+        assert happy_mocks.emitter.call_args.kwargs["return_terminal_event"] is True
+
+    @patch("lambda_handler.RETURN_TERMINAL_EVENT", True)
+    def test_terminal_event_returned_without_bus_or_worker(
+        self, happy_mocks, handler, monkeypatch
+    ):
+        """Test that the terminal event is built on the handler thread, bus or not."""
+        import service_event_emitter
+
+        monkeypatch.setattr(
+            "lambda_handler.ServiceEventEmitter",
+            service_event_emitter.ServiceEventEmitter,
+        )
+        monkeypatch.setattr(service_event_emitter, "EVENT_BUS_NAME", None)
+        stub_input_object(happy_mocks.s3)
+        # Keep the background worker busy for the whole invocation
+        release = threading.Event()
+        service_event_emitter._emit_queue.put((release.wait, (5,), {}))
+        monkeypatch.setattr("lambda_handler.TERMINAL_EVENT_FLUSH_TIMEOUT_SECONDS", 0.01)
+
+        try:
+            result = handler(BASE_EVENT, None)
+        finally:
+            release.set()
+
+        assert result["terminal_event"]["DetailType"] == "service.completed"
+        assert "EventBusName" not in result["terminal_event"]
+        assert result["terminal_event"]["Detail"]["job_id"] == "test-123"
+
+
+class TestDownstreamFanout:
+    """Test asynchronous invocation of downstream stages."""
+
+    @pytest.fixture(autouse=True)
+    def allow_downstream(self, monkeypatch):
+        allowed = {"stage-b", "stage-c", *(f"stage-{i}" for i in range(100))}
+        monkeypatch.setattr("lambda_handler.DOWNSTREAM_FUNCTIONS", frozenset(allowed))
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_next_stages_invoked_with_output(self, mock_lambda, happy_mocks, handler):
+        """Test that each next stage gets this stage's output as its input."""
+        event = {
+            **BASE_EVENT,
+            "job_id": "test-next-123",
+            "input_key": "file.xlsx",
+            "stage_config": {"next_stages": ["stage-b", "stage-c"]},
+        }
+
+        stub_input_object(happy_mocks.s3)
+
+        result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert result["metadata"]["next_stages_dispatched"] == 2
+
+        calls = mock_lambda.return_value.invoke.call_args_list
+        assert [c.kwargs["FunctionName"] for c in calls] == ["stage-b", "stage-c"]
+        assert all(c.kwargs["InvocationType"] == "Event" for c in calls)
+        payloads = [json.loads(c.kwargs["Payload"]) for c in calls]
+        assert all(p["invocation_type"] == "direct" for p in payloads)
+        assert all(p["input_bucket"] == "output" for p in payloads)
+        assert all(p["input_key"] == "jobs/test-next-123/output.xlsx" for p in payloads)
+        # Each stage writes its own output and knows which stage it is
+        assert [p["output_key"] for p in payloads] == [
+            "jobs/test-next-123/stage-b/output.xlsx",
+            "jobs/test-next-123/stage-c/output.xlsx",
+        ]
+        assert [p["stage_config"] for p in payloads] == [
+            {"stage_id": "stage-b"},
+            {"stage_id": "stage-c"},
+        ]
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_next_stage_config_passed_on(self, mock_lambda, happy_mocks, handler):
+        """Test that a next stage given as a dict gets its own config and output."""
+        event = {
+            **BASE_EVENT,
+            "stage_config": {
+                "next_stages": [
+                    {
+                        "function_name": "stage-b",
+                        "stage_id": "summary",
+                        "stage_config": {"template_name": "short"},
+                        "output_key": "jobs/test-123/summary.pdf",
+                    }
+                ]
+            },
+        }
+
+        stub_input_object(happy_mocks.s3)
+
+        handler(event, None)
+
+        payload = json.loads(
+            mock_lambda.return_value.invoke.call_args.kwargs["Payload"]
+        )
+        assert payload["output_key"] == "jobs/test-123/summary.pdf"
+        assert payload["stage_config"] == {
+            "template_name": "short",
+            "stage_id": "summary",
+        }
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_next_stage_cannot_overwrite_input(self, mock_lambda, happy_mocks, handler):
+        """Test that a next stage writing to its own input is rejected up front."""
+        event = {
+            **BASE_EVENT,
+            "output_key": "jobs/test-123/out.xlsx",
+            "stage_config": {
+                "next_stages": [
+                    {"function_name": "stage-b", "output_key": "jobs/test-123/out.xlsx"}
+                ]
+            },
+        }
+
+        result = handler(event, None)
+
+        assert_error(result, "ValueError", "overwrite")
+        assert not happy_mocks.process.called
+        assert not mock_lambda.return_value.invoke.called
+
+    @pytest.mark.parametrize(
+        "stage_config",
+        [
+            {"next_stages": "stage-b"},
+            {"next_stages": ["stage-b", 7]},
+            {"next_stage": {"stage_id": "summary"}},
+        ],
+        ids=["string", "non_str_item", "no_function_name"],
+    )
+    @patch("lambda_handler._get_lambda_client")
+    def test_malformed_next_stages_rejected(
+        self, mock_lambda, stage_config, happy_mocks, handler
+    ):
+        """Test that next_stages that aren't a list of stages fail up front."""
+        result = handler({**BASE_EVENT, "stage_config": stage_config}, None)
+
+        assert_error(result, "ValueError", "stage")
+        assert not happy_mocks.process.called
+        assert not mock_lambda.return_value.invoke.called
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_dispatch_failure_reported_after_success(
+        self, mock_lambda, happy_mocks, handler
+    ):
+        """Test that a failed invoke is reported without failing the finished job."""
+        event = {**BASE_EVENT, "stage_config": {"next_stages": ["stage-b"]}}
+        mock_lambda.return_value.invoke.side_effect = RuntimeError("TooManyRequests")
+
+        stub_input_object(happy_mocks.s3)
+
+        result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert result["dispatch_error"] == "TooManyRequests"
+        assert result["dispatch_error_type"] == "RuntimeError"
+        assert "next_stages_dispatched" not in result["metadata"]
+        assert happy_mocks.emitter_instance.emit_success.called
+        assert not happy_mocks.emitter_instance.emit_error.called
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_partial_dispatch_reports_only_started_stages(
+        self, mock_lambda, happy_mocks, handler
+    ):
+        """Test that a dispatch failing partway reports which stages are left."""
+        event = {
+            **BASE_EVENT,
+            "stage_config": {
+                "next_stages": ["stage-b", "stage-c"],
+                "dispatch_mode": "async",
+            },
+        }
+        mock_lambda.return_value.invoke.side_effect = [
+            None,
+            RuntimeError("TooManyRequests"),
+        ]
+
+        stub_input_object(happy_mocks.s3)
+
+        result = handler(event, None)
+
+        assert result["status"] == "success"
+        assert result["dispatch_mode"] == "async"
+        assert result["next_stages"] == ["stage-b"]
+        assert result["next_stages_not_started"] == ["stage-c"]
+        assert result["dispatch_error"] == "TooManyRequests"
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_relayed_fanout_records_started_groups(
+        self, mock_lambda, monkeypatch, handler_module
+    ):
+        """Test that only groups handed to a relay count as started."""
+        monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "this-function")
+        mock_lambda.return_value.invoke.side_effect = [None, RuntimeError("throttled")]
+        invocations = [
+            {"function_name": f"stage-{i}", "payload": {"invocation_type": "direct"}}
+            for i in range(100)
+        ]
+        started = []
+
+        with pytest.raises(RuntimeError):
+            handler_module._fanout_invoke(invocations, started=started)
+
+        assert started == [f"stage-{i}" for i in range(10)]
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_large_fanout_relayed_in_sqrt_groups(
+        self, mock_lambda, monkeypatch, handler_module
+    ):
+        """Test that 100 targets are relayed through 10 invocations of 10."""
+        monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "this-function")
+        invocations = [
+            {"function_name": f"stage-{i}", "payload": {"invocation_type": "direct"}}
+            for i in range(100)
+        ]
+
+        handler_module._fanout_invoke(invocations)
+
+        calls = mock_lambda.return_value.invoke.call_args_list
+        assert len(calls) == 10
+        assert all(c.kwargs["FunctionName"] == "this-function" for c in calls)
+        payloads = [json.loads(c.kwargs["Payload"]) for c in calls]
+        assert all(p["invocation_type"] == "fanout" for p in payloads)
+        assert sum(len(p["children"]) for p in payloads) == 100
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_fanout_event_invokes_children(self, mock_lambda, handler):
+        """Test that a relay invocation invokes its children directly."""
+        children = [
+            {"function_name": f"stage-{i}", "payload": {"invocation_type": "direct"}}
+            for i in range(3)
+        ]
+
+        result = handler({"invocation_type": "fanout", "children": children}, None)
+
+        assert result["status"] == "success"
+        assert mock_lambda.return_value.invoke.call_count == 3
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_fanout_event_never_relays_again(self, mock_lambda, monkeypatch, handler):
+        """Test that a relay group larger than FANOUT_DIRECT_LIMIT isn't split again."""
+        monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "this-function")
+        children = [
+            {"function_name": f"stage-{i}", "payload": {"invocation_type": "direct"}}
+            for i in range(10)
+        ]
+
+        result = handler({"invocation_type": "fanout", "children": children}, None)
+
+        assert result["metadata"]["dispatched"] == 10
+        calls = mock_lambda.return_value.invoke.call_args_list
+        assert [c.kwargs["FunctionName"] for c in calls] == [
+            f"stage-{i}" for i in range(10)
+        ]
+
+    @pytest.mark.parametrize(
+        "child",
+        [
+            {"function_name": "someone-elses-function", "payload": {}},
+            {
+                "function_name": "arn:aws:lambda:us-east-1:999999999999:function:stage-b",
+                "payload": {"invocation_type": "direct"},
+            },
+            {"function_name": "stage-b", "payload": {"invocation_type": "fanout"}},
+        ],
+        ids=["unknown_function", "other_account_arn", "nested_relay"],
+    )
+    @patch("lambda_handler._get_lambda_client")
+    def test_fanout_event_rejects_foreign_targets(self, mock_lambda, child, handler):
+        """Test that a relay event can only start this stage's own downstream stages."""
+        children = [
+            {"function_name": "stage-c", "payload": {"invocation_type": "direct"}},
+            child,
+        ]
+
+        result = handler({"invocation_type": "fanout", "children": children}, None)
+
+        assert_error(result, "ValueError")
+        assert not mock_lambda.return_value.invoke.called
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_unlisted_next_stage_rejected(self, mock_lambda, happy_mocks, handler):
+        """Test that next_stages outside DOWNSTREAM_FUNCTIONS fail before processing."""
+        event = {**BASE_EVENT, "stage_config": {"next_stages": ["stage-z"]}}
+
+        result = handler(event, None)
+
+        assert_error(result, "ValueError", "DOWNSTREAM_FUNCTIONS")
+        assert not happy_mocks.process.called
+
+    @patch("lambda_handler._get_lambda_client")
+    def test_async_dispatch_mode_reported(self, mock_lambda, happy_mocks, handler):
+        """Test that async dispatch of a single next_stage is reported to the caller."""
+        event = {
+            **BASE_EVENT,
+            "job_id": "test-async-123",
+            "input_key": "file.xlsx",
+            "stage_config": {"next_stage": "stage-b", "dispatch_mode": "async"},
+        }
+
+        stub_input_object(happy_mocks.s3)
+
+        result = handler(event, None)
+
+        assert result["dispatch_mode"] == "async"
+        assert result["next_stages"] == ["stage-b"]
+        mock_lambda.return_value.invoke.assert_called_once()
+        assert (
+            mock_lambda.return_value.invoke.call_args.kwargs["InvocationType"]
+            == "Event"
         )
 
 
@@ -539,7 +885,3 @@ class TestServiceEventEmitter:
 #         pass
 #
 # =============================================================================
-
-
-if __name__ == "__main__":
-    pytest.main([__file__, "-v", "--cov=lambda_handler", "--cov-report=term-missing"])
@@ -0,0 +1,307 @@
+"""Unit tests for the pipelined S3 streams."""
+
+import io
+import os
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from s3_streams import (
+    MemoryReader,
+    MultipartUploadWriter,
+    PrefetchingReader,
+    download_ranged,
+    download_ranged_to_file,
+)
+
+
+def make_s3_client():
+    """Create a mock S3 client that accepts multipart uploads."""
+    s3 = MagicMock()
+    s3.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    s3.upload_part.side_effect = lambda **kwargs: {
+        "ETag": f"etag-{kwargs['PartNumber']}"
+    }
+    return s3
+
+
+def make_ranged_s3_client(data):
+    """Create a mock S3 client that serves Range GETs from data."""
+
+    def get_object(Bucket, Key, Range, **kwargs):
+        start, end = (int(x) for x in Range[len("bytes=") :].split("-"))
+        return {"Body": io.BytesIO(data[start : end + 1])}
+
+    s3 = MagicMock()
+    s3.get_object.side_effect = get_object
+    return s3
+
+
+class TestDownloadRanged:
+    """Test the parallel byte-range downloader."""
+
+    def test_reassembles_object(self):
+        """Test that ranges are written to the right offsets."""
+        data = bytes(range(256)) * 41  # not a multiple of the part count
+        s3 = make_ranged_s3_client(data)
+
+        result = download_ranged(s3, "bucket", "key", len(data), parts=8)
+
+        assert result == data
+        assert s3.get_object.call_count == 8
+
+    def test_short_read_raises(self):
+        """Test that a truncated range is reported instead of returning zeros."""
+        s3 = MagicMock()
+        s3.get_object.return_value = {"Body": io.BytesIO(b"short")}
+
+        with pytest.raises(IOError):
+            download_ranged(s3, "bucket", "key", 100, parts=1)
+
+    def test_ranges_pinned_to_etag(self):
+        """Test that every range GET is conditional on the same ETag."""
+        data = b"x" * 100
+        s3 = make_ranged_s3_client(data)
+
+        download_ranged(s3, "bucket", "key", len(data), parts=4, etag='"abc"')
+
+        assert {c.kwargs["IfMatch"] for c in s3.get_object.call_args_list} == {'"abc"'}
+
+    def test_empty_object(self):
+        """Test that a zero-byte object needs no range GETs."""
+        s3 = MagicMock()
+
+        assert download_ranged(s3, "bucket", "key", 0) == bytearray()
+        assert not s3.get_object.called
+
+    def test_failure_waits_for_other_ranges(self):
+        """Test that no range is still running once the error is raised."""
+        reads = []
+        started = threading.Barrier(2)
+
+        class SlowBody(io.BytesIO):
+            def read(self, size=-1):
+                time.sleep(0.01)
+                reads.append(size)
+                return super().read(size)
+
+        def get_object(Bucket, Key, Range, **kwargs):
+            start, end = (int(x) for x in Range[len("bytes=") :].split("-"))
+            started.wait(5)
+            if start == 0:
+                raise ConnectionError("connection reset")
+            return {"Body": SlowBody(b"x" * (end - start + 1))}
+
+        s3 = MagicMock()
+        s3.get_object.side_effect = get_object
+
+        with pytest.raises(ConnectionError), patch("s3_streams._RANGE_READ_SIZE", 1):
+            download_ranged(s3, "bucket", "key", 200, parts=2)
+        reads_at_raise = len(reads)
+        time.sleep(0.1)
+
+        assert len(reads) == reads_at_raise
+        assert reads_at_raise < 100
+
+
+class TestDownloadRangedToFile:
+    """Test the parallel byte-range downloader writing to disk."""
+
+    def test_writes_object_to_preallocated_file(self, tmp_path):
+        """Test that ranges land at the right offsets in a file of exact size."""
+        data = bytes(range(256)) * 41
+        s3 = make_ranged_s3_client(data)
+        path = tmp_path / "input"
+        path.write_bytes(b"stale contents longer than nothing" * 1000)
+
+        download_ranged_to_file(s3, "bucket", "key", len(data), str(path), parts=8)
+
+        assert path.read_bytes() == data
+        assert s3.get_object.call_count == 8
+
+    def test_failed_range_leaves_no_writer_behind(self, tmp_path, monkeypatch):
+        """Test that no range writes to the fd once the file is closed and removed."""
+        writes_after_close = []
+        closed = threading.Event()
+        real_pwrite, real_close = os.pwrite, os.close
+
+        def pwrite(fd, data, offset):
+            time.sleep(0.001)  # a slow disk keeps the ranges busy
+            if closed.is_set():
+                writes_after_close.append(offset)
+            return real_pwrite(fd, data, offset)
+
+        def close(fd):
+            closed.set()
+            real_close(fd)
+
+        def get_object(Bucket, Key, Range, **kwargs):
+            start, end = (int(x) for x in Range[len("bytes=") :].split("-"))
+            if start == 0:
+                time.sleep(0.02)
+                raise ConnectionError("connection reset")
+            return {"Body": io.BytesIO(b"x" * (end - start + 1))}
+
+        s3 = MagicMock()
+        s3.get_object.side_effect = get_object
+        monkeypatch.setattr("s3_streams._RANGE_READ_SIZE", 16)
+        monkeypatch.setattr("s3_streams.os.pwrite", pwrite)
+        monkeypatch.setattr("s3_streams.os.close", close)
+        path = tmp_path / "input"
+
+        with pytest.raises(ConnectionError):
+            download_ranged_to_file(s3, "bucket", "key", 8000, str(path), parts=8)
+        time.sleep(0.1)
+
+        assert writes_after_close == []
+        assert not path.exists()
+
+
+class TestMemoryReader:
+    """Test the zero-copy in-memory input stream."""
+
+    def test_reads_and_seeks(self):
+        """Test that reads, seeks and readinto follow the file protocol."""
+        reader = MemoryReader(bytearray(b"0123456789"))
+
+        assert reader.read(4) == b"0123"
+        assert reader.seek(-2, io.SEEK_END) == 8
+        assert reader.read() == b"89"
+        assert reader.read(1) == b""
+
+        reader.seek(2)
+        target = bytearray(3)
+        assert reader.readinto(target) == 3
+        assert target == b"234"
+
+    def test_shares_buffer_without_copy(self):
+        """Test that getbuffer() exposes the wrapped buffer itself, read-only."""
+        buffer = bytearray(b"abc")
+        reader = MemoryReader(buffer)
+        view = reader.getbuffer()
+
+        buffer[0:1] = b"z"
+
+        assert view.readonly
+        assert bytes(view) == b"zbc"
+
+
+class TestPrefetchingReader:
+    """Test the read-ahead input stream."""
+
+    def test_reads_whole_body_in_small_reads(self):
+        """Test that chunked reads return the source bytes in order."""
+        data = bytes(range(256)) * 100
+        with PrefetchingReader(io.BytesIO(data), chunk_size=1000) as reader:
+            received = b"".join(iter(lambda: reader.read(333), b""))
+
+        assert received == data
+
+    def test_readall(self):
+        """Test that read() without a size returns everything."""
+        data = b"abc" * 5000
+        with PrefetchingReader(io.BytesIO(data), chunk_size=1024) as reader:
+            assert reader.read(10) == data[:10]
+            assert reader.read() == data[10:]
+
+    def test_source_error_raised_in_consumer(self):
+        """Test that a download failure surfaces on the reading thread."""
+        body = MagicMock()
+        body.read.side_effect = ConnectionError("connection reset")
+
+        with PrefetchingReader(body) as reader:
+            with pytest.raises(ConnectionError):
+                reader.read()
+
+    def test_close_stops_download(self):
+        """Test that closing early releases the worker and the source."""
+        body = MagicMock()
+        body.read.return_value = b"x" * 10
+
+        reader = PrefetchingReader(body, chunk_size=10, depth=1)
+        reader.read(5)
+        reader.close()
+        reader._future.result(timeout=5)
+
+        assert body.close.called
+
+
+class TestMultipartUploadWriter:
+    """Test the upload-while-writing output stream."""
+
+    def test_small_output_uses_single_put(self):
+        """Test that output below one part is sent with put_object."""
+        s3 = make_s3_client()
+
+        with MultipartUploadWriter(s3, "bucket", "key") as writer:
+            writer.write(b"hello")
+            writer.complete()
+
+        s3.put_object.assert_called_once_with(Bucket="bucket", Key="key", Body=b"hello")
+        assert not s3.create_multipart_upload.called
+        assert writer.bytes_written == 5
+
+    def test_large_output_uses_multipart(self):
+        """Test that full parts are uploaded in order and completed."""
+        s3 = make_s3_client()
+
+        with MultipartUploadWriter(s3, "bucket", "key", part_size=4) as writer:
+            writer.write(b"aaaabb")
+            writer.write(b"bbcc")
+            writer.complete()
+
+        bodies = [c.kwargs["Body"] for c in s3.upload_part.call_args_list]
+        assert bodies == [b"aaaa", b"bbbb", b"cc"]
+        s3.complete_multipart_upload.assert_called_once_with(
+            Bucket="bucket",
+            Key="key",
+            UploadId="upload-1",
+            MultipartUpload={
+                "Parts": [
+                    {"ETag": "etag-1", "PartNumber": 1},
+                    {"ETag": "etag-2", "PartNumber": 2},
+                    {"ETag": "etag-3", "PartNumber": 3},
+                ]
+            },
+        )
+        assert writer.bytes_written == 10
+
+    def test_close_without_complete_aborts(self):
+        """Test that an unfinished upload is aborted instead of completed."""
+        s3 = make_s3_client()
+
+        with pytest.raises(RuntimeError):
+            with MultipartUploadWriter(s3, "bucket", "key", part_size=4) as writer:
+                writer.write(b"aaaabbbb")
+                raise RuntimeError("processing failed")
+
+        s3.abort_multipart_upload.assert_called_once_with(
+            Bucket="bucket", Key="key", UploadId="upload-1"
+        )
+        assert not s3.complete_multipart_upload.called
+
+    def test_abort_failure_logged(self, caplog):
+        """Test that a failed abort is logged as a warning, not raised."""
+        s3 = make_s3_client()
+        s3.abort_multipart_upload.side_effect = ConnectionError("network down")
+
+        writer = MultipartUploadWriter(s3, "bucket", "key", part_size=4)
+        writer.write(b"aaaa")
+        writer.close()
+
+        assert "Failed to abort multipart upload: network down" in caplog.text
+
+    def test_part_upload_error_raised_on_complete(self):
+        """Test that a failed part upload surfaces to the producer."""
+        s3 = make_s3_client()
+        s3.upload_part.side_effect = ConnectionError("upload failed")
+
+        with MultipartUploadWriter(s3, "bucket", "key", part_size=4) as writer:
+            writer.write(b"aaaa")
+            with pytest.raises(ConnectionError):
+                writer.complete()
+
+        assert not s3.complete_multipart_upload.called
+        assert s3.abort_multipart_upload.called
@@ -0,0 +1,359 @@
+"""Unit tests for the VeloFlow ServiceEventEmitter."""
+
+import json
+import re
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import service_event_emitter
+from service_event_emitter import (
+    BackgroundEventEmitter,
+    ServiceEventEmitter,
+)
+
+
+@pytest.fixture
+def events_client(monkeypatch):
+    """Install a mock EventBridge client as the shared client."""
+    client = MagicMock()
+    client.put_events.return_value = {"FailedEntryCount": 0, "Entries": [{}]}
+    monkeypatch.setattr(service_event_emitter, "_events_client", client)
+    monkeypatch.setattr(
+        service_event_emitter, "EVENT_BUS_NAME", "veloflow-test-event-bus"
+    )
+    return client
+
+
+def sent_details(client):
+    """Return the decoded Detail payloads of every put_events call."""
+    return [
+        json.loads(entry["Detail"])
+        for call in client.put_events.call_args_list
+        for entry in call.kwargs["Entries"]
+    ]
+
+
+class TestTimestamp:
+    """Test event timestamp formatting."""
+
+    def test_reused_within_a_millisecond(self, monkeypatch):
+        """Test that the formatted timestamp is only rebuilt once it is 1 ms old."""
+        monkeypatch.setattr(service_event_emitter, "_timestamp_cache", (0, ""))
+        clock = iter([5_000_000, 5_500_000, 6_000_000])
+        monkeypatch.setattr(
+            service_event_emitter.time, "monotonic_ns", lambda: next(clock)
+        )
+
+        first = service_event_emitter._utc_timestamp()
+        second = service_event_emitter._utc_timestamp()
+        third = service_event_emitter._utc_timestamp()
+
+        assert first is second
+        assert third is not first
+        assert re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}Z", third)
+
+
+class TestEventsClient:
+    """Test EventBridge client reuse."""
+
+    def test_client_created_once(self, monkeypatch):
+        """Test that emitters share one boto3 client, created on first use."""
+        monkeypatch.setattr(service_event_emitter, "_events_client", None)
+
+        with patch("service_event_emitter.boto3") as mock_boto3:
+            first = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+            second = ServiceEventEmitter(job_id="job-2", service_id="svc-v1")
+            assert not mock_boto3.client.called
+
+            assert first.events_client is second.events_client
+
+        mock_boto3.client.assert_called_once_with(
+            "events", config=service_event_emitter.EVENTS_CLIENT_CONFIG
+        )
+
+
+class TestEmission:
+    """Test event payloads sent to EventBridge."""
+
+    def test_progress_event(self, events_client):
+        """Test that progress events carry job context and message."""
+        emitter = ServiceEventEmitter(
+            job_id="job-1", service_id="svc-v1", stage_id="stage-a"
+        )
+        emitter.emit_progress("Working...")
+
+        entry = events_client.put_events.call_args.kwargs["Entries"][0]
+        assert entry["Source"] == "veloflow.service"
+        assert entry["DetailType"] == "service.progress"
+        assert entry["EventBusName"] == "veloflow-test-event-bus"
+
+        detail = json.loads(entry["Detail"])
+        assert detail["job_id"] == "job-1"
+        assert detail["service_id"] == "svc-v1"
+        assert detail["stage_id"] == "stage-a"
+        assert detail["status"] == "in_progress"
+        assert detail["message"] == "Working..."
+        assert re.fullmatch(
+            r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}Z", detail["timestamp"]
+        )
+
+    def test_success_event_includes_output_key(self, events_client):
+        """Test that success events include the output key."""
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_success("Done", output_key="jobs/job-1/output.xlsx")
+
+        [detail] = sent_details(events_client)
+        assert detail["status"] == "success"
+        assert detail["output_key"] == "jobs/job-1/output.xlsx"
+
+    def test_error_event_includes_error_type(self, events_client):
+        """Test that error events include the error type."""
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_error("Failed", error_type="ValueError")
+
+        [detail] = sent_details(events_client)
+        assert detail["status"] == "error"
+        assert detail["error_type"] == "ValueError"
+
+    def test_unset_fields_omitted(self, events_client):
+        """Test that a missing stage_id and metadata are left out of the payload."""
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_progress("Working...")
+        emitter.emit_progress("Page 1", metadata={"page": 1})
+
+        first, second = sent_details(events_client)
+        assert "stage_id" not in first
+        assert "metadata" not in first
+        assert second["metadata"] == {"page": 1}
+
+    def test_non_str_metadata_keys(self, events_client):
+        """Test that integer metadata keys are stringified, not dropping the event."""
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_progress("Página 1", metadata={1: "done"})
+
+        [detail] = sent_details(events_client)
+        assert detail["metadata"] == {"1": "done"}
+        assert detail["message"] == "Página 1"
+
+    def test_event_bus_override(self, events_client):
+        """Test that an emitter can publish to a bus other than EVENT_BUS_NAME."""
+        emitter = ServiceEventEmitter(
+            job_id="job-1", service_id="svc-v1", event_bus_name="other-bus"
+        )
+        emitter.emit_progress("Working...")
+
+        entry = events_client.put_events.call_args.kwargs["Entries"][0]
+        assert entry["EventBusName"] == "other-bus"
+
+    def test_skipped_without_event_bus(self, events_client, monkeypatch):
+        """Test that nothing is sent when EVENT_BUS_NAME is not set."""
+        monkeypatch.setattr(service_event_emitter, "EVENT_BUS_NAME", None)
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_progress("Working...")
+
+        assert not events_client.put_events.called
+
+    def test_put_events_failure_does_not_raise(self, events_client):
+        """Test that EventBridge errors never break the service."""
+        events_client.put_events.side_effect = RuntimeError("network down")
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+
+        emitter.emit_progress("Working...")
+
+
+class TestBatching:
+    """Test coalescing events into batched PutEvents requests."""
+
+    def test_progress_events_sent_when_batch_full(self, events_client):
+        """Test that progress events are held until the batch is full."""
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1", batch_size=3)
+        emitter.emit_progress("Step 1")
+        emitter.emit_progress("Step 2")
+
+        assert not events_client.put_events.called
+
+        emitter.emit_progress("Step 3")
+
+        assert events_client.put_events.call_count == 1
+        assert [d["message"] for d in sent_details(events_client)] == [
+            "Step 1",
+            "Step 2",
+            "Step 3",
+        ]
+
+    def test_terminal_event_flushes_batch(self, events_client):
+        """Test that a success event is sent together with pending progress."""
+        emitter = ServiceEventEmitter(
+            job_id="job-1", service_id="svc-v1", batch_size=10
+        )
+        emitter.emit_progress("Step 1")
+        emitter.emit_success("Done")
+
+        assert events_client.put_events.call_count == 1
+        assert [d["status"] for d in sent_details(events_client)] == [
+            "in_progress",
+            "success",
+        ]
+
+    def test_context_manager_flushes(self, events_client):
+        """Test that leaving the with block sends trailing events."""
+        with ServiceEventEmitter(
+            job_id="job-1", service_id="svc-v1", batch_size=10
+        ) as emitter:
+            emitter.emit_progress("Step 1")
+
+        assert [d["message"] for d in sent_details(events_client)] == ["Step 1"]
+
+    def test_invalid_batch_size(self, events_client):
+        """Test that batches above the PutEvents limit are rejected."""
+        with pytest.raises(ValueError):
+            ServiceEventEmitter(job_id="job-1", service_id="svc-v1", batch_size=11)
+
+
+class TestSkipUnrouted:
+    """Test dropping events that no EventBridge rule matches."""
+
+    @pytest.fixture(autouse=True)
+    def enable(self, monkeypatch):
+        monkeypatch.setattr(service_event_emitter, "SKIP_UNROUTED_EVENTS", True)
+        monkeypatch.setattr(service_event_emitter, "_rule_cache", {})
+
+    def test_unmatched_event_type_not_sent(self, events_client):
+        """Test that only event types with a matching enabled rule are sent."""
+        events_client.list_rules.return_value = {
+            "Rules": [
+                {
+                    "State": "ENABLED",
+                    "EventPattern": json.dumps(
+                        {
+                            "source": ["veloflow.service"],
+                            "detail-type": ["service.completed"],
+                        }
+                    ),
+                }
+            ]
+        }
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_progress("Working...")
+        emitter.emit_progress("Still working...")
+        emitter.emit_success("Done")
+
+        assert [d["status"] for d in sent_details(events_client)] == ["success"]
+        # One lookup per event type, then cached
+        assert events_client.list_rules.call_count == 2
+
+    def test_sent_when_rules_cannot_be_listed(self, events_client):
+        """Test that a failed rule lookup never drops events."""
+        events_client.list_rules.side_effect = RuntimeError("AccessDenied")
+        emitter = ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        emitter.emit_progress("Working...")
+
+        assert len(sent_details(events_client)) == 1
+
+
+class TestReturnTerminalEvent:
+    """Test holding back success/error events for Step Functions to send."""
+
+    def test_terminal_event_kept_not_sent(self, events_client):
+        """Test that progress is sent but the success event is only stored."""
+        emitter = ServiceEventEmitter(
+            job_id="job-1", service_id="svc-v1", return_terminal_event=True
+        )
+        emitter.emit_progress("Working...")
+        emitter.emit_success("Done", output_key="out.xlsx")
+
+        assert [d["status"] for d in sent_details(events_client)] == ["in_progress"]
+        assert emitter.terminal_event["DetailType"] == "service.completed"
+        detail = json.loads(emitter.terminal_event["Detail"])
+        assert detail["job_id"] == "job-1"
+        assert detail["output_key"] == "out.xlsx"
+        # Same source and bus as the events sent directly
+        sent = events_client.put_events.call_args.kwargs["Entries"][0]
+        for field in ("Source", "EventBusName"):
+            assert emitter.terminal_event[field] == sent[field]
+
+    def test_terminal_event_built_without_event_bus(self, events_client, monkeypatch):
+        """Test that the held-back entry doesn't need EVENT_BUS_NAME to be built."""
+        monkeypatch.setattr(service_event_emitter, "EVENT_BUS_NAME", None)
+        emitter = ServiceEventEmitter(
+            job_id="job-1", service_id="svc-v1", return_terminal_event=True
+        )
+        emitter.emit_error("Failed", error_type="ValueError")
+
+        assert emitter.terminal_event["DetailType"] == "service.failed"
+        assert "EventBusName" not in emitter.terminal_event
+        assert not events_client.put_events.called
+
+
+class TestBackgroundEventEmitter:
+    """Test the background-thread emission adapter."""
+
+    def test_events_sent_in_order_after_flush(self, events_client):
+        """Test that queued events are all sent, in order, by flush()."""
+        emitter = BackgroundEventEmitter(
+            ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        )
+        emitter.emit_progress("Step 1")
+        emitter.emit_progress("Step 2")
+        emitter.emit_success("Done", output_key="out.xlsx")
+
+        assert emitter.flush(timeout=5)
+        assert [d["message"] for d in sent_details(events_client)] == [
+            "Step 1",
+            "Step 2",
+            "Done",
+        ]
+
+    def test_emit_does_not_wait_for_eventbridge(self, events_client):
+        """Test that emit returns before the slow put_events call finishes."""
+        release = threading.Event()
+        events_client.put_events.side_effect = lambda **kwargs: (
+            release.wait(5) and {"FailedEntryCount": 0}
+        )
+        emitter = BackgroundEventEmitter(
+            ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        )
+
+        emitter.emit_progress("Working...")
+        assert not emitter.flush(timeout=0.05)
+
+        release.set()
+        assert emitter.flush(timeout=5)
+        assert events_client.put_events.call_count == 1
+
+    def test_events_stamped_when_queued(self, events_client, monkeypatch):
+        """Test that a backlog doesn't shift timestamps to the time of sending."""
+        release = threading.Event()
+        emitter = BackgroundEventEmitter(
+            ServiceEventEmitter(job_id="job-1", service_id="svc-v1")
+        )
+        # Hold the worker so the event is still queued when the clock moves on
+        service_event_emitter._emit_queue.put((release.wait, (5,), {}))
+        monkeypatch.setattr(service_event_emitter, "_utc_timestamp", lambda: "queued")
+        emitter.emit_progress("Working...")
+        monkeypatch.setattr(service_event_emitter, "_utc_timestamp", lambda: "sent")
+
+        release.set()
+        assert emitter.flush(timeout=5)
+        [detail] = sent_details(events_client)
+        assert detail["timestamp"] == "queued"
+
+    def test_terminal_event_set_without_flush(self, events_client):
+        """Test that the held-back entry is ready as soon as emit_success returns."""
+        release = threading.Event()
+        emitter = BackgroundEventEmitter(
+            ServiceEventEmitter(
+                job_id="job-1", service_id="svc-v1", return_terminal_event=True
+            )
+        )
+        service_event_emitter._emit_queue.put((release.wait, (5,), {}))
+        emitter.emit_progress("Working...")
+
+        emitter.emit_success("Done")
+
+        assert emitter.terminal_event["DetailType"] == "service.completed"
+        release.set()
+        assert emitter.flush(timeout=5)
+        assert [d["status"] for d in sent_details(events_client)] == ["in_progress"]